@@ -0,0 +1,148 @@
+import argparse
+import importlib
+import statistics
+import sys
+import time
+
+from multiprocessing import cpu_count
+
+from simulation import Card, SAMPLING_STRATEGIES, simulate_batch, split_batches
+from sim_worker import BACKENDS, measure_worker_startup, run_batches
+
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+SUITS = ['♠', '♣', '♥', '♦']
+
+# One representative spot per street: hero hole cards and the board so far
+STREET_SPOTS = {
+    'preflop': (['A♠', 'K♠'], []),
+    'flop': (['A♠', 'K♠'], ['10♠', '7♥', '2♠']),
+    'turn': (['A♠', 'K♠'], ['10♠', '7♥', '2♠', 'Q♦']),
+    'river': (['A♠', 'K♠'], ['10♠', '7♥', '2♠', 'Q♦', '3♣'])
+}
+
+# Further spots per street for the variance benchmark, so a factor is not fitted to one hand
+VARIANCE_SPOTS = {
+    'preflop': (STREET_SPOTS['preflop'], (['Q♥', 'Q♦'], []), (['7♣', '6♣'], []), (['A♦', '5♠'], [])),
+    'flop': (STREET_SPOTS['flop'], (['Q♥', 'Q♦'], ['K♣', '8♦', '4♥']), (['7♣', '6♣'], ['9♣', '8♥', '2♣']),
+             (['A♦', '5♠'], ['A♥', 'J♣', '6♦'])),
+    'turn': (STREET_SPOTS['turn'], (['Q♥', 'Q♦'], ['K♣', '8♦', '4♥', '2♠']), (['7♣', '6♣'], ['9♣', '8♥', '2♣', 'K♦']),
+             (['A♦', '5♠'], ['A♥', 'J♣', '6♦', '10♥'])),
+    'river': (STREET_SPOTS['river'], (['Q♥', 'Q♦'], ['K♣', '8♦', '4♥', '2♠', '9♥']),
+              (['7♣', '6♣'], ['9♣', '8♥', '2♣', 'K♦', '3♥']), (['A♦', '5♠'], ['A♥', 'J♣', '6♦', '10♥', '4♣']))
+}
+
+
+def parse_cards(texts):
+    return [Card(text[:-1], text[-1]) for text in texts]
+
+
+def spot_args(street, num_players, spot=None):
+    hole, community = spot or STREET_SPOTS[street]
+    hole_cards = parse_cards(hole)
+    community_cards = parse_cards(community)
+    known_cards = set(hole_cards + community_cards)
+    available_cards = [Card(rank, suit) for rank in RANKS for suit in SUITS
+                       if Card(rank, suit) not in known_cards]
+    return hole_cards, community_cards, available_cards, num_players, 5 - len(community_cards)
+
+
+def bench_variance(samples, replicates, num_players, streets, strategies):
+    print(f"Equity estimator variance, {samples} samples x {replicates} replicates, {num_players} players")
+    print(f"{'street':<8}{'spot':<22}{'strategy':<12}{'mean win%':>10}{'std err':>10}{'var ratio':>11}{'ms/est':>9}")
+    strategies = ['plain'] + [strategy for strategy in strategies if strategy != 'plain']
+    # A variance ratio from n replicates each has a relative standard error of about sqrt(4 / (n - 1))
+    ratio_error = (4 / (replicates - 1)) ** 0.5
+    for street in streets:
+        ratios = {strategy: [] for strategy in strategies}
+        for spot in VARIANCE_SPOTS[street]:
+            hole_cards, community_cards, available_cards, players, unknown_cards = spot_args(street, num_players, spot)
+            label = ' '.join(spot[0]) + (' / ' + ' '.join(spot[1]) if spot[1] else '')
+            plain_variance = None
+            for strategy in strategies:
+                estimates = []
+                start = time.perf_counter()
+                for _ in range(replicates):
+                    counts = simulate_batch((hole_cards, community_cards, available_cards,
+                                             players, unknown_cards, samples, strategy))
+                    # Ties count half so the estimate tracks equity rather than outright wins
+                    estimates.append((counts['win'] + counts['tie'] / 2) / samples * 100)
+                elapsed = (time.perf_counter() - start) / replicates * 1000
+                variance = statistics.variance(estimates)
+                if plain_variance is None:
+                    plain_variance = variance
+                ratio = variance / plain_variance if plain_variance else 0.0
+                ratios[strategy].append(ratio)
+                print(f"{street:<8}{label[:21]:<22}{strategy:<12}{statistics.mean(estimates):>10.2f}"
+                      f"{variance ** 0.5:>10.3f}{ratio:>11.3f}{elapsed:>9.1f}")
+        for strategy in strategies[1:]:
+            mean_ratio = statistics.mean(ratios[strategy])
+            error = sum((ratio * ratio_error) ** 2 for ratio in ratios[strategy]) ** 0.5 / len(ratios[strategy])
+            print(f"{street:<8}{'all spots':<22}{strategy:<12}{'':>20}{mean_ratio:>11.3f} +/- {error:.3f}")
+
+
+def bench_startup(processes, as_main):
+    # Compare against a plain spawn pool whose children re-import a heavy __main__,
+    # e.g. `--as-main monsterhand` to measure what the GUI entry point costs
+    if as_main:
+        sys.modules['__main__'] = importlib.import_module(as_main)
+    print(f"Per-worker startup time, {processes} spawned processes")
+    for label, lightweight in (('sim_worker entry', True), (f"__main__ = {as_main or 'benchmarks'}", False)):
+        times = measure_worker_startup(processes, lightweight)
+        print(f"{label:<32} min {min(times) * 1000:7.1f} ms  "
+              f"mean {statistics.mean(times) * 1000:7.1f} ms  max {max(times) * 1000:7.1f} ms")
+
+
+def bench_backends(samples, num_players, strategy):
+    # Timings include pool start-up, as SimulationWorker pays it on every calculation
+    worker_counts = sorted({1, 2, 4, cpu_count()})
+    gil = "free-threaded" if hasattr(sys, '_is_gil_enabled') and not sys._is_gil_enabled() else "GIL"
+    print(f"Backend wall time for {samples} samples, {num_players} players, {strategy} sampling ({gil} build)")
+    print(f"{'street':<8}{'workers':>8}" + ''.join(f"{backend:>10}" for backend in BACKENDS) + "   fastest")
+    for street in STREET_SPOTS:
+        hole_cards, community_cards, available_cards, players, unknown_cards = spot_args(street, num_players)
+        for workers in worker_counts:
+            args = [(hole_cards, community_cards, available_cards, players, unknown_cards, batch_size, strategy)
+                    for batch_size in split_batches(samples, workers * 4)]
+            timings = {}
+            for backend in BACKENDS:
+                start = time.perf_counter()
+                run_batches(args, backend, workers)
+                timings[backend] = time.perf_counter() - start
+            fastest = min(timings, key=timings.get)
+            print(f"{street:<8}{workers:>8}" + ''.join(f"{timings[b] * 1000:>8.0f}ms" for b in BACKENDS)
+                  + f"   {fastest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MonsterHand simulation benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    variance_parser = subparsers.add_parser('variance', help="Variance reduction of each sampling strategy per street")
+    variance_parser.add_argument('--samples', type=int, default=500)
+    variance_parser.add_argument('--replicates', type=int, default=200)
+    variance_parser.add_argument('--players', type=int, default=3)
+    variance_parser.add_argument('--streets', nargs='+', default=list(VARIANCE_SPOTS), choices=list(VARIANCE_SPOTS))
+    variance_parser.add_argument('--strategies', nargs='+', default=list(SAMPLING_STRATEGIES),
+                                 choices=SAMPLING_STRATEGIES)
+
+    startup_parser = subparsers.add_parser('startup', help="Per-worker startup time of spawned simulation pools")
+    startup_parser.add_argument('--processes', type=int, default=4)
+    startup_parser.add_argument('--as-main', default=None,
+                                help="Module to install as __main__ for the comparison pool, e.g. monsterhand")
+
+    backends_parser = subparsers.add_parser('backends', help="Process, thread and inline backends per street and core count")
+    backends_parser.add_argument('--samples', type=int, default=3000)
+    backends_parser.add_argument('--players', type=int, default=6)
+    backends_parser.add_argument('--strategy', default='stratified', choices=SAMPLING_STRATEGIES)
+
+    args = parser.parse_args()
+    if args.command == 'variance':
+        bench_variance(args.samples, args.replicates, args.players, args.streets, args.strategies)
+    elif args.command == 'startup':
+        bench_startup(args.processes, args.as_main)
+    elif args.command == 'backends':
+        bench_backends(args.samples, args.players, args.strategy)
+
+
+if __name__ == "__main__":
+    main()
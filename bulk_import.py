@@ -0,0 +1,203 @@
+"""Bulk import of hand-history archives on every core.
+
+Worker processes parse whole files and sum them into per-player and
+per-position counter deltas. The parent merges those totals into the
+stats database in large transactions. A file holding hands that were
+already imported is parsed again by the parent, which skips them by id.
+
+    python bulk_import.py "C:/Users/me/AppData/Local/PokerStars/HandHistory" --site PokerStars
+"""
+import argparse
+import logging
+import multiprocessing
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from hand_history import TOTAL_HANDS, HandHistoryProcessor
+from metrics import configure_logging, metrics
+from sim_worker import lightweight_main
+
+logger = logging.getLogger(__name__)
+
+SITES = ("PokerStars", "888poker", "Red Star Poker")
+COMMIT_EVERY = 20000     # Hands merged per database transaction
+PROGRESS_INTERVAL = 1.0  # Seconds between progress reports
+
+
+def find_history_files(folder, site):
+    pattern = '*.xml' if site == "Red Star Poker" else '*.txt'
+    return sorted(str(path) for path in Path(folder).rglob(pattern))
+
+
+def parse_file(args):
+    """Worker: returns (file_path, FileTotals, error) for one file."""
+    file_path, site = args
+    processor = HandHistoryProcessor(None, site)
+    totals = FileTotals()
+    try:
+        with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as file:
+            content = file.read()
+        if site == "Red Star Poker":
+            hand_units = ET.fromstring(content).findall('.//game')
+        else:
+            hand_units = processor.split_text_hands(content)
+
+        for hand in hand_units:
+            hand_id = processor.get_hand_id(hand)
+            if hand_id is not None and (site, hand_id) in processor.ingested_hands:
+                continue  # Repeated in this file
+            # Without a database every player starts at zero, so the processor's
+            # counters add up to the file's deltas
+            record = processor.process_hand(hand) if hand_id is not None else None
+            if record is None:
+                # Failed to parse, or without an id nothing would stop a re-import from
+                # counting it again. Left out either way
+                totals.failed += 1
+                continue
+            totals.hand_ids.append(hand_id)
+            totals.records.append(record)
+    except (OSError, ET.ParseError) as e:
+        return file_path, None, str(e)
+    totals.players = {player: (tuple(stats.counts), stats.position) for player, stats in processor.player_stats.items()}
+    totals.positions = processor.position_deltas
+    totals.recent = processor.recent_stats
+    return file_path, totals, None
+
+
+class FileTotals:
+    """One file's hands summed per player in a worker, so the parent merges totals instead of hands."""
+    __slots__ = ('hand_ids', 'records', 'failed', 'players', 'positions', 'recent')
+
+    def __init__(self):
+        self.hand_ids = []
+        self.records = []
+        self.failed = 0
+        self.players = {}    # player -> (summed counts, last position)
+        self.positions = {}  # (player, position code) -> summed positional counters
+        self.recent = {}     # player -> RecentStats over this file's hands
+
+
+def merge_totals(processor, file_path, totals, report):
+    site = processor.current_poker_site
+    report['errors'] += totals.failed
+    metrics.increment('hands_failed', totals.failed)
+    if any((site, hand_id) in processor.ingested_hands for hand_id in totals.hand_ids):
+        merge_hands(processor, file_path, totals, report)
+        return
+
+    for hand_id in totals.hand_ids:
+        processor.mark_hand_ingested(site, hand_id)
+    for record in totals.records:
+        processor.hand_writer.add(record)
+    processor.load_players(totals.players)
+    for player, (counts, position) in totals.players.items():
+        stats = processor.get_player_stats(player)
+        stats.add(counts)
+        stats.position = position
+        processor.get_recent_stats(player).extend(totals.recent[player], counts[TOTAL_HANDS])
+        processor.changed_players.add(player)
+    position_deltas = processor.position_deltas
+    for key, deltas in totals.positions.items():
+        if key in position_deltas:
+            position_deltas[key] = [a + b for a, b in zip(position_deltas[key], deltas)]
+        else:
+            position_deltas[key] = deltas
+    report['hands'] += len(totals.hand_ids)
+    metrics.increment('hands_imported', len(totals.hand_ids))
+
+
+def merge_hands(processor, file_path, totals, report):
+    # Some of the file is already stored, so the totals cannot be used. It is parsed
+    # again here a hand at a time and the processor skips known hands by id
+    pending = len(processor.pending_hands)
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as file:
+        processor.process_new_hands(file.read(), file_path)
+    imported = len(processor.pending_hands) - pending
+    report['hands'] += imported
+    report['skipped'] += len(totals.hand_ids) - imported
+    metrics.increment('hands_imported', imported)
+    metrics.increment('hands_skipped', len(totals.hand_ids) - imported)
+
+
+def commit(processor):
+    # Player types only need classifying once per transaction
+    for player in processor.changed_players:
+        stats = processor.player_stats[player]
+        stats.player_type = processor.determine_player_type(stats)
+    processor.flush()
+
+
+def import_folder(processor, folder, processes=None, progress=None):
+    """Imports every hand history under folder for the processor's site and returns the final report."""
+    site = processor.current_poker_site
+    files = find_history_files(folder, site)
+    processes = processes or multiprocessing.cpu_count()
+    report = {
+        'files': len(files),
+        'files_done': 0,
+        'hands': 0,
+        'skipped': 0,
+        'errors': 0,
+        'elapsed': 0.0,
+        'hands_per_second': 0.0,
+        'done': False
+    }
+    start = last_report = time.perf_counter()
+
+    # Children only import this module and the parser, never the GUI
+    context = multiprocessing.get_context('spawn')
+    with lightweight_main(__name__):
+        pool = context.Pool(processes=processes)
+    with pool:
+        for file_path, totals, error in pool.imap(parse_file, [(f, site) for f in files]):
+            if error is not None:
+                report['errors'] += 1
+                logger.warning("Error importing %s: %s", file_path, error)
+            else:
+                merge_totals(processor, file_path, totals, report)
+            report['files_done'] += 1
+            if len(processor.pending_hands) >= COMMIT_EVERY:
+                commit(processor)
+
+            now = time.perf_counter()
+            if progress and now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                report['elapsed'] = now - start
+                report['hands_per_second'] = report['hands'] / max(report['elapsed'], 1e-9)
+                progress(dict(report))
+    commit(processor)
+
+    report['elapsed'] = time.perf_counter() - start
+    report['hands_per_second'] = report['hands'] / max(report['elapsed'], 1e-9)
+    report['done'] = True
+    if progress:
+        progress(dict(report))
+    return report
+
+
+def format_progress(report):
+    status = "Import finished" if report['done'] else "Importing"
+    return (f"{status}: {report['files_done']}/{report['files']} files, {report['hands']} hands "
+            f"({report['skipped']} already imported, {report['errors']} errors), "
+            f"{report['hands_per_second']:.0f} hands/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import hand-history archives into the stats database")
+    parser.add_argument('folder')
+    parser.add_argument('--site', default="PokerStars", choices=SITES)
+    parser.add_argument('--db', default=str(Path.home() / "poker_stats.db"))
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    configure_logging()
+
+    processor = HandHistoryProcessor(Path(args.db), args.site)
+    try:
+        import_folder(processor, args.folder, args.processes, lambda report: print(format_progress(report)))
+    finally:
+        processor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import cpu_count
+from urllib import request as urlrequest
+
+from simulation import Card, SAMPLING_STRATEGIES, simulate_batch, split_batches, summarize_counts
+from sim_worker import create_pool
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+BATCH_WINDOW = 0.02   # Seconds to wait for more requests before dispatching a batch
+CACHE_SIZE = 512      # Number of finished spots kept in the result cache
+ROUNDS_PER_TASK = 250 # Rounds simulated per pool task
+
+
+def card_to_str(card):
+    return f"{card.rank}{card.suit}"
+
+
+def parse_card(text):
+    # Suit is always the last character, rank may be two characters ('10')
+    return Card(text[:-1], text[-1])
+
+
+def spot_key(hole_cards, community_cards, num_players, unknown_cards, num_samples, strategy):
+    # Card order does not change the equity, so identical spots share a key
+    return (
+        tuple(sorted(card_to_str(c) for c in hole_cards)),
+        tuple(sorted(card_to_str(c) for c in community_cards)),
+        num_players,
+        unknown_cards,
+        num_samples,
+        strategy
+    )
+
+
+class _PendingSpot:
+    def __init__(self, key, hole_cards, community_cards, num_players, unknown_cards, num_samples, strategy):
+        self.key = key
+        self.hole_cards = hole_cards
+        self.community_cards = community_cards
+        self.num_players = num_players
+        self.unknown_cards = unknown_cards
+        self.num_samples = num_samples
+        self.strategy = strategy
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def simulation_args(self):
+        known_cards = set(self.hole_cards + self.community_cards)
+        available_cards = [card for card in (Card(rank, suit)
+                           for rank in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+                           for suit in ['♠', '♣', '♥', '♦'])
+                           if card not in known_cards]
+        num_tasks = max(1, -(-self.num_samples // ROUNDS_PER_TASK))
+        return [(self.hole_cards, self.community_cards, available_cards,
+                 self.num_players, self.unknown_cards, batch_size, self.strategy)
+                for batch_size in split_batches(self.num_samples, num_tasks)]
+
+
+class EquityService:
+    """Owns the simulation pool and result cache shared by every client.
+
+    Concurrent requests are coalesced into one batched pool job and
+    identical in-flight spots are only simulated once.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or cpu_count()
+        self.pool = None
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.pending = []
+        self.lock = threading.Lock()
+        self.has_work = threading.Condition(self.lock)
+        self.running = False
+        self.batcher = None
+        self.stats = {
+            'requests': 0,
+            'cache_hits': 0,
+            'deduplicated': 0,
+            'batches': 0,
+            'spots_simulated': 0,
+            'samples_simulated': 0
+        }
+
+    def start(self):
+        self.pool = create_pool(self.processes)
+        self.running = True
+        self.batcher = threading.Thread(target=self._batch_loop, daemon=True)
+        self.batcher.start()
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+            self.has_work.notify_all()
+        if self.batcher:
+            self.batcher.join()
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+
+    def calculate(self, hole_cards, community_cards, num_players, unknown_cards, num_samples, strategy='stratified'):
+        if strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown sampling strategy: {strategy}")
+        key = spot_key(hole_cards, community_cards, num_players, unknown_cards, num_samples, strategy)
+        with self.lock:
+            self.stats['requests'] += 1
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.stats['cache_hits'] += 1
+                return dict(self.cache[key])
+
+            spot = self.in_flight.get(key)
+            if spot is not None:
+                self.stats['deduplicated'] += 1
+            else:
+                spot = _PendingSpot(key, list(hole_cards), list(community_cards),
+                                    num_players, unknown_cards, num_samples, strategy)
+                self.in_flight[key] = spot
+                self.pending.append(spot)
+                self.has_work.notify()
+
+        spot.done.wait()
+        if spot.error is not None:
+            raise RuntimeError(spot.error)
+        return dict(spot.result)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['cached_spots'] = len(self.cache)
+            stats['in_flight'] = len(self.in_flight)
+            stats['processes'] = self.processes
+            return stats
+
+    def _batch_loop(self):
+        while True:
+            with self.lock:
+                while self.running and not self.pending:
+                    self.has_work.wait()
+                if not self.running:
+                    return
+
+            # Let concurrent callers join the batch before dispatching it
+            time.sleep(BATCH_WINDOW)
+
+            with self.lock:
+                batch = self.pending
+                self.pending = []
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        all_args = []
+        task_counts = []
+        for spot in batch:
+            spot_args = spot.simulation_args()
+            all_args.extend(spot_args)
+            task_counts.append(len(spot_args))
+
+        try:
+            batch_counts = self.pool.map(simulate_batch, all_args)
+            error = None
+        except Exception as e:
+            batch_counts = None
+            error = str(e)
+
+        with self.lock:
+            self.stats['batches'] += 1
+            offset = 0
+            for spot, num_tasks in zip(batch, task_counts):
+                if error is None:
+                    result_counts = {"win": 0, "tie": 0, "lose": 0}
+                    for counts in batch_counts[offset:offset + num_tasks]:
+                        for outcome, count in counts.items():
+                            result_counts[outcome] += count
+                    offset += num_tasks
+                    spot.result = summarize_counts(result_counts)
+                    self.cache[spot.key] = spot.result
+                    self.stats['spots_simulated'] += 1
+                    self.stats['samples_simulated'] += spot.num_samples
+                else:
+                    spot.error = error
+                del self.in_flight[spot.key]
+                spot.done.set()
+
+            while len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+
+class EquityRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.server.service.get_stats())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/equity':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            spot = json.loads(self.rfile.read(length).decode('utf-8'))
+            result = self.server.service.calculate(
+                [parse_card(c) for c in spot['hole_cards']],
+                [parse_card(c) for c in spot['community_cards']],
+                int(spot['num_players']),
+                int(spot['unknown_cards']),
+                int(spot['num_samples']),
+                spot.get('strategy', 'stratified')
+            )
+        except (KeyError, ValueError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        # Keep the console quiet, every calculator window polls this service
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class EquityServiceClient:
+    """Client used by PokerCalculator when a local equity service is running."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=30.0):
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+
+    def is_available(self):
+        try:
+            self.get_stats(timeout=0.5)
+            return True
+        except OSError:
+            return False
+
+    def get_stats(self, timeout=None):
+        with urlrequest.urlopen(f"{self.base_url}/stats", timeout=timeout or self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def calculate(self, hole_cards, community_cards, num_players, unknown_cards, num_samples, strategy='stratified'):
+        payload = json.dumps({
+            'hole_cards': [card_to_str(c) for c in hole_cards],
+            'community_cards': [card_to_str(c) for c in community_cards],
+            'num_players': num_players,
+            'unknown_cards': unknown_cards,
+            'num_samples': num_samples,
+            'strategy': strategy
+        }).encode('utf-8')
+        req = urlrequest.Request(f"{self.base_url}/equity", data=payload,
+                                 headers={'Content-Type': 'application/json'})
+        with urlrequest.urlopen(req, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+
+def run_service(host=DEFAULT_HOST, port=DEFAULT_PORT, processes=None):
+    service = EquityService(processes)
+    service.start()
+    server = ThreadingHTTPServer((host, port), EquityRequestHandler)
+    server.service = service
+    print(f"Equity service listening on http://{host}:{port} ({service.processes} processes)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Local MonsterHand equity service")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    sys.exit(run_service(args.host, args.port, args.processes))
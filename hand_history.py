@@ -0,0 +1,916 @@
+"""Hand history parsing and player statistics, shared by the HUD and importers.
+
+Nothing in here imports Qt, so it runs on the ingestion thread and in
+worker processes alike.
+"""
+import logging
+import operator
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, deque
+from pathlib import Path
+
+from hand_tokenizer import (TOKENIZERS, ActionEvent, BlindEvent, ButtonEvent, SeatEvent, StreetEvent,
+                            TableEvent, BET, CALL, CHECK, FOLD, RAISE)
+from hand_store import (POSITION_CODES, POSITION_FIELDS, POSITION_UPSERT, HandWriter, build_hand_record,
+                        create_tables)
+from metrics import metrics
+from player_types import PlayerType, classify
+from rolling_stats import RecentStats, encode_hand
+from stats_db import StatsDatabase
+
+logger = logging.getLogger(__name__)
+
+
+# Counters kept per player, in player_stats column order
+STAT_FIELDS = (
+    'total_hands', 'vpip_hands', 'pfr_hands', 'total_actions', 'bets', 'raises',
+    'calls', 'checks', 'threebets', 'threebet_opportunities', 'faced_3bet',
+    'folded_to_3bet', 'cbets', 'cbet_opportunities'
+)
+
+(TOTAL_HANDS, VPIP_HANDS, PFR_HANDS, TOTAL_ACTIONS, BETS, RAISES, CALLS, CHECKS, THREEBETS,
+ THREEBET_OPPORTUNITIES, FACED_3BET, FOLDED_TO_3BET, CBETS, CBET_OPPORTUNITIES) = range(len(STAT_FIELDS))
+FIELD_INDEX = {field: index for index, field in enumerate(STAT_FIELDS)}
+ZERO_COUNTS = (0,) * len(STAT_FIELDS)
+# Where each positional counter sits in a STAT_FIELDS tuple
+POSITION_FIELD_INDEXES = tuple(STAT_FIELDS.index(field) for field in POSITION_FIELDS)
+
+# Adds a batch of deltas to player_stats. Rows are never overwritten, so
+# imports running in other processes keep their counts. A NULL type keeps
+# the stored one.
+PLAYER_STATS_UPSERT = '''
+    INSERT INTO player_stats (player_name, {fields}, player_type, last_position) VALUES (?, {values}, ?, ?)
+    ON CONFLICT (player_name) DO UPDATE SET {updates},
+        player_type = COALESCE(excluded.player_type, player_type), last_position = excluded.last_position
+'''.format(
+    fields=', '.join(STAT_FIELDS),
+    values=', '.join('?' * len(STAT_FIELDS)),
+    updates=', '.join(f'{field} = {field} + excluded.{field}' for field in STAT_FIELDS)
+)
+
+# Players looked up per query, well under SQLite's bound parameter limit
+LOAD_CHUNK = 500
+# Players kept in memory per view, the least recently seen clean ones go first
+MAX_CACHED_PLAYERS = 20000
+
+# Tables tracked at once, the one with the oldest hand is dropped first
+MAX_TABLES = 24
+TABLE_IDLE_SECONDS = 15 * 60  # A table without a hand for this long is closed
+RECENT_TABLE_HANDS = 20       # Hand ids kept per table
+
+# Hand number patterns used to key ingested hands
+HAND_ID_PATTERNS = {
+    "PokerStars": [re.compile(r"PokerStars Hand #(\d+)")],
+    "888poker": [re.compile(r"#Game No : (\d+)"), re.compile(r"888poker Hand History for Game (\d+)")]
+}
+
+def build_position_sequence(total_players):
+    # Positions indexed by distance clockwise from the button
+    positions = [''] * total_players
+    positions[0] = 'BTN'
+    positions[1 % total_players] = 'SB'
+    positions[2 % total_players] = 'BB'
+
+    # Remaining seats are named working backwards from the button
+    if total_players >= 9:
+        names = ['CO', 'HJ', 'MP+1', 'MP', 'UTG+2', 'UTG+1', 'UTG']
+    elif total_players >= 7:
+        names = ['CO', 'HJ', 'MP', 'UTG+1', 'UTG']
+    elif total_players >= 6:
+        names = ['CO', 'HJ', 'UTG']
+    else:
+        names = ['CO', 'UTG']
+    for i in range(total_players - 3):  # -3 for BTN, SB, BB
+        positions[total_players - 1 - i] = names[i] if i < len(names) else 'Unknown'
+    return tuple(positions)
+
+# Position sequences for every table size, keyed by number of active players
+POSITION_SEQUENCES = {total: build_position_sequence(total) for total in range(1, 11)}
+
+
+def position_sequence(total_players):
+    sequence = POSITION_SEQUENCES.get(total_players)
+    if sequence is None:
+        sequence = POSITION_SEQUENCES[total_players] = build_position_sequence(total_players)
+    return sequence
+
+
+class PlayerRecord:
+    """One player's counters in STAT_FIELDS order, plus type and last position.
+
+    Indexing by field name still works (record['vpip_hands']) for code that
+    reads stats like a dict, the parser itself works on whole count lists.
+    """
+    __slots__ = ('counts', 'player_type', 'position')
+
+    def __init__(self, counts=ZERO_COUNTS, player_type=PlayerType.UNKNOWN, position=None):
+        self.counts = list(counts)
+        self.player_type = player_type
+        self.position = position
+
+    def add(self, deltas):
+        self.counts = list(map(operator.add, self.counts, deltas))
+
+    def __getitem__(self, key):
+        index = FIELD_INDEX.get(key)
+        return getattr(self, key) if index is None else self.counts[index]
+
+    def __setitem__(self, key, value):
+        index = FIELD_INDEX.get(key)
+        if index is None:
+            setattr(self, key, value)
+        else:
+            self.counts[index] = value
+
+    def as_dict(self):
+        stats = dict(zip(STAT_FIELDS, self.counts))
+        stats['player_type'] = self.player_type
+        stats['position'] = self.position
+        return stats
+
+
+def empty_stats(player_type=PlayerType.UNKNOWN):
+    # A zeroed stats dict, for display code that has nothing stored yet
+    return PlayerRecord(player_type=player_type).as_dict()
+
+
+class PlayerCache(OrderedDict):
+    """Player name -> PlayerRecord, least recently used first. Unknown players start at zero."""
+
+    def __missing__(self, player_name):
+        record = self[player_name] = PlayerRecord()
+        return record
+
+    def touch(self, player_names):
+        for player_name in player_names:
+            self.move_to_end(player_name)
+
+    def evict(self, limit, keep=()):
+        # Drops the coldest players over the limit, except those still to be written
+        evicted = []
+        if len(self) <= limit:
+            return evicted
+        for player_name in list(self):
+            if len(self) <= limit:
+                break
+            if player_name not in keep:
+                del self[player_name]
+                evicted.append(player_name)
+        return evicted
+
+
+class TableState:
+    """Who sits at one table, its latest hands and the session stats made there."""
+    __slots__ = ('key', 'name', 'players', 'recent_hands', 'session_stats', 'changed_players', 'last_hand')
+
+    def __init__(self, key, name):
+        self.key = key
+        self.name = name
+        self.players = set()
+        self.recent_hands = deque(maxlen=RECENT_TABLE_HANDS)
+        self.session_stats = PlayerCache()
+        self.changed_players = set()  # Changed since the last take_table_updates()
+        self.last_hand = time.monotonic()
+
+
+def stats_from_row(row):
+    # A player_stats row (player_name first) as a PlayerRecord
+    return PlayerRecord([count or 0 for count in row[1:15]], row[15] or PlayerType.UNKNOWN, row[16])
+
+
+class HandHistoryProcessor:
+    def __init__(self, db_path, site="PokerStars", db=None):
+        # Without a db_path every player starts from zero and nothing is
+        # written, which is how import workers turn hands into deltas.
+        # A StatsDatabase passed in is shared, its writer lock orders both processors' batches
+        self.db_path = db_path
+        self.current_poker_site = site
+        self.db = db or (StatsDatabase(db_path) if db_path is not None else None)
+        # Changes not yet written, see journal_batch() and flush()
+        self.pending_hands = []
+        self.hand_writer = HandWriter()
+        self.position_deltas = {}  # (player, position code) -> counter deltas
+        self.recent_stats = {}  # player -> RecentStats, last-N-hands and decayed views
+        self.changed_players = set()
+        self.dirty_players = set()
+        # Counters as of the last journal entry or database row, deltas are taken against these
+        self.journaled_counts = {}
+        
+        # All-time stats, authoritative until flushed, see journal_batch() and flush()
+        self.player_stats = PlayerCache()
+        self.current_source = None
+        self.reset_session(site)
+        
+        if self.db is not None:
+            self.initialize_database()
+            self.replay_journal()
+        # (site, hand id) of every hand already counted
+        self.ingested_hands = self.load_ingested_hands() if self.db is not None else set()
+
+    def reset_session(self, site):
+        self.current_poker_site = site
+        # Table key -> TableState, least recently played first
+        self.tables = OrderedDict()
+        self.closed_tables = []
+
+    def table_for(self, table_info):
+        # Keyed by table name where the site writes one, else by the file the hand came from
+        key = table_info.get('table_name') or self.current_source or self.current_poker_site
+        table = self.tables.get(key)
+        if table is None:
+            name = table_info.get('table_name') or Path(key).stem
+            table = self.tables[key] = TableState(key, name)
+            while len(self.tables) > MAX_TABLES:
+                self.closed_tables.append(self.tables.popitem(last=False)[0])
+        self.tables.move_to_end(key)
+        table.last_hand = time.monotonic()
+        return table
+
+    def close_idle_tables(self, now=None):
+        now = time.monotonic() if now is None else now
+        for key, table in list(self.tables.items()):
+            if now - table.last_hand < TABLE_IDLE_SECONDS:
+                break  # Oldest first, the rest are more recent
+            del self.tables[key]
+            self.closed_tables.append(key)
+
+    def take_table_updates(self):
+        """([(table, players changed there)] since the last call, keys of tables closed since)."""
+        self.close_idle_tables()
+        updated = []
+        for table in self.tables.values():
+            if table.changed_players:
+                updated.append((table, table.changed_players))
+                table.changed_players = set()
+        closed, self.closed_tables = self.closed_tables, []
+        return updated, closed
+
+    def seated_players(self):
+        players = set()
+        for table in self.tables.values():
+            players |= table.players
+        return players
+
+    def initialize_database(self):
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS player_stats (
+                    player_name TEXT PRIMARY KEY,
+                    total_hands INTEGER,
+                    vpip_hands INTEGER,
+                    pfr_hands INTEGER,
+                    total_actions INTEGER,
+                    bets INTEGER,
+                    raises INTEGER,
+                    calls INTEGER,
+                    checks INTEGER,
+                    threebets INTEGER,
+                    threebet_opportunities INTEGER,
+                    faced_3bet INTEGER,
+                    folded_to_3bet INTEGER,
+                    cbets INTEGER,
+                    cbet_opportunities INTEGER,
+                    player_type TEXT,
+                    last_position TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS file_offsets (
+                    file_path TEXT PRIMARY KEY,
+                    offset INTEGER,
+                    inode INTEGER,
+                    size INTEGER,
+                    last_hand_checksum TEXT,
+                    last_hand_length INTEGER,
+                    last_game_id TEXT,
+                    updated_at REAL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ingested_hands (
+                    site TEXT,
+                    hand_id TEXT,
+                    ingested_at REAL,
+                    PRIMARY KEY (site, hand_id)
+                )
+            ''')
+            # Counter deltas of hands counted since player_stats was last written
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS stats_journal (
+                    entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    player_name TEXT,
+                    {},
+                    last_position TEXT
+                )
+            '''.format(',\n                    '.join(f'{field} INTEGER' for field in STAT_FIELDS)))
+            # Databases created before last_game_id was tracked
+            cursor.execute('PRAGMA table_info(file_offsets)')
+            if 'last_game_id' not in [column[1] for column in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE file_offsets ADD COLUMN last_game_id TEXT')
+            # Ring buffer and decayed totals per player, see rolling_stats
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS player_recent_stats (
+                    player_name TEXT PRIMARY KEY,
+                    window BLOB,
+                    window_start INTEGER,
+                    window_count INTEGER,
+                    decayed BLOB
+                )
+            ''')
+            # Every hand with its players and actions, see hand_store
+            create_tables(cursor)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+
+    def load_ingested_hands(self):
+        return set(self.db.read('SELECT site, hand_id FROM ingested_hands'))
+
+    def mark_hand_ingested(self, site, hand_id):
+        self.ingested_hands.add((site, hand_id))
+        self.pending_hands.append((site, hand_id, time.time()))
+
+    def journal_batch(self, file_offsets=None):
+        # The cache stays authoritative and player_stats is only written by flush().
+        # Until then each batch appends its counter deltas to the journal, in the same
+        # transaction as its hand ids, file offsets and the players' recent views,
+        # so a crash loses no hand.
+        changed_players = self.changed_players
+        entries = []
+        journaled = {}
+        for player in changed_players:
+            stats = self.player_stats[player]
+            counts = journaled[player] = tuple(stats.counts)
+            base = self.journaled_counts.get(player, ZERO_COUNTS)
+            entries.append((player,) + tuple(map(operator.sub, counts, base)) + (stats.position,))
+        with metrics.timer('db'), self.db.transaction() as cursor:
+            cursor.executemany(
+                'INSERT INTO stats_journal (player_name, {}, last_position) VALUES ({})'.format(
+                    ', '.join(STAT_FIELDS), ', '.join('?' * (len(STAT_FIELDS) + 2))
+                ),
+                entries
+            )
+            self.write_recent_stats(cursor, changed_players)
+            self.write_pending(cursor, file_offsets)
+        # Baselines only move once the batch is committed. If it fails, everything stays
+        # pending and the next batch journals it again
+        self.journaled_counts.update(journaled)
+        self.clear_pending()
+        self.dirty_players |= changed_players
+        self.changed_players = set()
+        self.evict_cold_players()
+        return changed_players
+
+    def flush(self, file_offsets=None):
+        # One transaction adds the journal and every dirty player's unjournaled deltas
+        # to player_stats, with the hands they came from and the file offsets after them
+        changed_players = self.changed_players
+        dirty_players = self.dirty_players | changed_players
+        with metrics.timer('db'), self.db.transaction() as cursor:
+            # The journal may also hold entries from another process that has not flushed
+            deltas = {}
+            journal = cursor.execute('SELECT player_name, {}, last_position FROM stats_journal ORDER BY entry_id'.format(
+                ', '.join(STAT_FIELDS)
+            ))
+            for row in journal:
+                self.merge_deltas(deltas, row[0], row[1:-1], row[-1])
+            for player in dirty_players:
+                stats = self.player_stats[player]
+                counts = tuple(stats.counts)
+                base = self.journaled_counts.get(player, ZERO_COUNTS)
+                if counts != base:
+                    self.merge_deltas(deltas, player, map(operator.sub, counts, base), stats.position)
+            cursor.executemany(PLAYER_STATS_UPSERT, [
+                (player, *counts, self.stored_player_type(player), position)
+                for player, (counts, position) in deltas.items()
+            ])
+            reloaded = self.reload_counts(cursor, dirty_players)
+            # Recent views of journaled players went in with their batch
+            self.write_recent_stats(cursor, changed_players)
+            self.write_pending(cursor, file_offsets)
+            cursor.execute('DELETE FROM stats_journal')
+        self.apply_reloaded(reloaded)
+        self.clear_pending()
+        self.changed_players = set()
+        self.dirty_players = set()
+        self.evict_cold_players()
+        return changed_players
+
+    def write_recent_stats(self, cursor, player_names):
+        cursor.executemany(
+            'INSERT OR REPLACE INTO player_recent_stats VALUES (?, ?, ?, ?, ?)',
+            [self.recent_stats[player].to_row(player) for player in player_names if player in self.recent_stats]
+        )
+
+    def merge_deltas(self, deltas, player_name, counts, position):
+        # Entries are summed per player; the last position seen wins
+        if player_name in deltas:
+            counts = map(operator.add, deltas[player_name][0], counts)
+        deltas[player_name] = (tuple(counts), position)
+
+    def stored_player_type(self, player_name):
+        stats = self.player_stats.get(player_name)
+        return str(stats.player_type) if stats is not None else None
+
+    def reload_counts(self, cursor, player_names):
+        # Rows now include what other writers added. Players whose counts moved are
+        # classified again; the cache takes the result over once the flush commits
+        player_names = list(player_names)
+        reloaded = {}
+        reclassified = []
+        for i in range(0, len(player_names), LOAD_CHUNK):
+            chunk = player_names[i:i + LOAD_CHUNK]
+            rows = cursor.execute(
+                'SELECT * FROM player_stats WHERE player_name IN ({})'.format(','.join('?' * len(chunk))),
+                chunk
+            ).fetchall()
+            for row in rows:
+                stats = self.player_stats[row[0]]
+                counts = [count or 0 for count in row[1:15]]
+                player_type = stats.player_type
+                if counts != stats.counts:
+                    player_type = self.determine_player_type(PlayerRecord(counts, player_type, stats.position))
+                    reclassified.append((str(player_type), row[0]))
+                reloaded[row[0]] = (counts, player_type)
+        cursor.executemany('UPDATE player_stats SET player_type = ? WHERE player_name = ?', reclassified)
+        return reloaded
+
+    def apply_reloaded(self, reloaded):
+        for player, (counts, player_type) in reloaded.items():
+            stats = self.player_stats[player]
+            stats.counts = counts
+            stats.player_type = player_type
+            self.journaled_counts[player] = tuple(counts)
+
+    def evict_cold_players(self):
+        # Only players already written can go, they are reloaded when seen again
+        keep = self.dirty_players | self.changed_players | self.seated_players()
+        for player in self.player_stats.evict(MAX_CACHED_PLAYERS, keep):
+            self.journaled_counts.pop(player, None)
+            self.recent_stats.pop(player, None)
+        for table in self.tables.values():
+            table.session_stats.evict(MAX_CACHED_PLAYERS, table.players)
+
+    def forget_stored_players(self):
+        # Another writer changed player rows. Players without pending changes are read
+        # again when next seen, flush() reloads the others
+        keep = self.dirty_players | self.changed_players
+        for player in self.player_stats.evict(0, keep):
+            self.journaled_counts.pop(player, None)
+            self.recent_stats.pop(player, None)
+
+    def record_hand_counts(self, player_name, position, counts):
+        # counts is a full STAT_FIELDS tuple with one hand's deltas. Without a database
+        # these add up to one file's totals, which import workers send back
+        self.get_recent_stats(player_name).add_hand(encode_hand(dict(zip(STAT_FIELDS, counts))))
+        position_code = POSITION_CODES.get(position)
+        if position_code is None:
+            return
+        deltas = self.position_deltas.get((player_name, position_code))
+        if deltas is None:
+            deltas = self.position_deltas[(player_name, position_code)] = [0] * len(POSITION_FIELDS)
+        for i, index in enumerate(POSITION_FIELD_INDEXES):
+            deltas[i] += counts[index]
+
+    def write_pending(self, cursor, file_offsets):
+        cursor.executemany(
+            'INSERT OR IGNORE INTO ingested_hands (site, hand_id, ingested_at) VALUES (?, ?, ?)',
+            self.pending_hands
+        )
+        self.hand_writer.write(cursor)
+        cursor.executemany(POSITION_UPSERT, [key + tuple(deltas) for key, deltas in self.position_deltas.items()])
+        for file_path, state in (file_offsets or {}).items():
+            self.write_file_offset(cursor, file_path, state)
+
+    def clear_pending(self):
+        # Called once the transaction that wrote them has committed
+        self.pending_hands = []
+        self.position_deltas = {}
+        self.hand_writer.clear()
+
+    def replay_journal(self):
+        # Deltas journaled before an unclean shutdown, folded into player_stats
+        rows = self.db.read('SELECT player_name, {}, last_position FROM stats_journal ORDER BY entry_id'.format(
+            ', '.join(STAT_FIELDS)
+        ))
+        if not rows:
+            return
+        logger.info("Replaying %d journaled stat changes", len(rows))
+        self.load_players(row[0] for row in rows)
+        for row in rows:
+            stats = self.player_stats[row[0]]
+            stats.add(row[1:-1])
+            stats.position = row[-1]
+            # Already journaled, flush() adds these rows and must not count them again
+            self.journaled_counts[row[0]] = tuple(stats.counts)
+            self.dirty_players.add(row[0])
+        for player in self.dirty_players:
+            self.player_stats[player].player_type = self.determine_player_type(self.player_stats[player])
+        self.flush()
+
+    def load_file_offsets(self):
+        rows = self.db.read('''
+            SELECT file_path, offset, inode, size, last_hand_checksum,
+                   last_hand_length, last_game_id, updated_at
+            FROM file_offsets
+        ''')
+        return {
+            row[0]: {
+                'offset': row[1] or 0,
+                'inode': row[2],
+                'size': row[3] or 0,
+                'last_hand_checksum': row[4],
+                'last_hand_length': row[5] or 0,
+                'last_game_id': row[6],
+                'updated_at': row[7]
+            }
+            for row in rows
+        }
+
+    def save_file_offset(self, file_path, state):
+        with self.db.transaction() as cursor:
+            self.write_file_offset(cursor, file_path, state)
+
+    def write_file_offset(self, cursor, file_path, state):
+        cursor.execute('''
+            INSERT OR REPLACE INTO file_offsets (
+                file_path, offset, inode, size,
+                last_hand_checksum, last_hand_length, last_game_id, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            file_path,
+            state['offset'],
+            state['inode'],
+            state['size'],
+            state['last_hand_checksum'],
+            state['last_hand_length'],
+            state.get('last_game_id'),
+            state['updated_at']
+        ))
+
+    def load_player_stats(self, player_name):
+        if self.db is None:
+            return None
+        row = self.db.read_one('SELECT * FROM player_stats WHERE player_name = ?', (player_name,))
+        return stats_from_row(row) if row else None
+
+    def load_players(self, player_names):
+        # Pull every uncached player in as few queries as possible
+        if self.db is None:
+            return
+        missing = [player for player in set(player_names) if player not in self.player_stats]
+        for i in range(0, len(missing), LOAD_CHUNK):
+            chunk = missing[i:i + LOAD_CHUNK]
+            rows = self.db.read(
+                'SELECT * FROM player_stats WHERE player_name IN ({})'.format(','.join('?' * len(chunk))),
+                chunk
+            )
+            for row in rows:
+                self.cache_player(row[0], stats_from_row(row))
+            rows = self.db.read(
+                'SELECT * FROM player_recent_stats WHERE player_name IN ({})'.format(','.join('?' * len(chunk))),
+                chunk
+            )
+            for row in rows:
+                self.recent_stats[row[0]] = RecentStats.from_row(row)
+            for player in chunk:
+                # New players start with empty views, no need to ask again later
+                if player not in self.recent_stats:
+                    self.recent_stats[player] = RecentStats()
+
+    def cache_player(self, player_name, stats):
+        self.player_stats[player_name] = stats
+        self.journaled_counts[player_name] = tuple(stats.counts)
+
+    def get_player_stats(self, player_name):
+        # Cached stats, loaded from the database the first time a player is seen
+        if player_name not in self.player_stats:
+            existing_stats = self.load_player_stats(player_name)
+            if existing_stats:
+                self.cache_player(player_name, existing_stats)
+        return self.player_stats[player_name]
+
+    def get_recent_stats(self, player_name):
+        recent = self.recent_stats.get(player_name)
+        if recent is None and self.db is None:
+            recent = self.recent_stats[player_name] = RecentStats()
+        elif recent is None:
+            row = self.db.read_one('SELECT * FROM player_recent_stats WHERE player_name = ?', (player_name,))
+            recent = self.recent_stats[player_name] = RecentStats.from_row(row) if row else RecentStats()
+        return recent
+
+    def save_player_stats(self, player_name, stats):
+        with self.db.transaction() as cursor:
+            self.write_player_stats(cursor, player_name, stats)
+
+    def write_player_stats(self, cursor, player_name, stats):
+        # Overwrites the whole row, flush() adds deltas instead
+        cursor.execute('''
+            INSERT OR REPLACE INTO player_stats (
+                player_name, total_hands, vpip_hands, pfr_hands,
+                total_actions, bets, raises, calls, checks,
+                threebets, threebet_opportunities, faced_3bet,
+                folded_to_3bet, cbets, cbet_opportunities,
+                player_type, last_position
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (player_name, *stats.counts, str(stats.player_type), stats.position))
+
+    def determine_player_type(self, stats):
+        # Profiles are precomputed per sample size, see player_types
+        return classify(stats)
+
+    def process_new_hands(self, content, source=None):
+        # source names the table for sites that do not write a table name
+        self.current_source = source
+        if self.current_poker_site == "Red Star Poker":
+            self.process_redstar_xml(content)
+        else:
+            self.process_text_hands(content)
+
+    def process_text_hands(self, content):
+        for hand_lines in self.split_text_hands(content):
+            self.process_hand(hand_lines)
+
+    def split_text_hands(self, content):
+        MAX_HAND_LINES = 200  # Reasonable max for a single hand
+        current_hand = []
+        for line in content.splitlines():
+            if len(line.strip()) == 0:  # Skip empty lines
+                continue
+            
+            # Detect start of hand based on site format
+            is_new_hand = False
+            if self.current_poker_site == "PokerStars" and "PokerStars Hand #" in line:
+                is_new_hand = True
+            elif self.current_poker_site == "888poker" and ("888poker Hand History for Game" in line or 
+                                                        "#Game No :" in line):
+                is_new_hand = True
+                
+            # 888poker repeats the game number on the line after "#Game No :"
+            if is_new_hand and len(current_hand) == 1 and "#Game No :" in current_hand[0]:
+                is_new_hand = False
+                
+            if is_new_hand:
+                if current_hand:
+                    if len(current_hand) < MAX_HAND_LINES:  # Validate hand size
+                        yield current_hand
+                    current_hand = [line]
+                else:
+                    current_hand = [line]
+            else:
+                current_hand.append(line)
+                
+        if current_hand and len(current_hand) < MAX_HAND_LINES:
+            yield current_hand
+
+    def process_redstar_xml(self, content):
+        try:
+            # Parse XML content
+            root = ET.fromstring(content)
+            self.process_redstar_games(root.findall('.//game'))
+        except ET.ParseError as e:
+            logger.warning("XML parsing error: %s", e)
+
+    def process_redstar_games(self, game_elements, source=None):
+        self.current_source = source
+        try:
+            # Process each game element (hand) in the session
+            for game_element in game_elements:
+                self.process_hand(game_element)
+                
+        except Exception as e:
+            logger.exception("Error processing Red Star XML: %s", e)
+
+    def parse_table_info(self, hand_lines, events=None):
+        tokenizer = TOKENIZERS[self.current_poker_site]
+        if events is None:
+            events = tokenizer.tokenize(hand_lines)
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("New %s hand, parsing table info", self.current_poker_site)
+        
+        table_info = {
+            'max_seats': 9,
+            'table_name': None,
+            'reported_button': None,
+            'actual_button': None,
+            'active_players': [],
+            'sb_player': None,
+            'bb_player': None,
+            'seat_sequence': []
+        }
+        
+        for event in events:
+            event_type = type(event)
+            if event_type is SeatEvent:
+                if not event.sitting_out:
+                    table_info['seat_sequence'].append(event.seat)
+                    table_info['active_players'].append({
+                        'seat': event.seat,
+                        'name': event.player
+                    })
+                    if debug:
+                        logger.debug("Active player: %s in seat %s", event.player, event.seat)
+            elif event_type is TableEvent:
+                table_info['max_seats'] = event.max_seats
+                table_info['table_name'] = event.name
+                if debug:
+                    logger.debug("Table type: %s-max", event.max_seats)
+            elif event_type is ButtonEvent:
+                table_info['reported_button'] = event.seat
+            elif event_type is BlindEvent:
+                table_info['sb_player' if event.blind == 'sb' else 'bb_player'] = event.player
+        
+        # Sort seat sequence
+        table_info['seat_sequence'].sort()
+        
+        if table_info['reported_button'] is not None:
+            table_info['actual_button'] = tokenizer.actual_button(table_info['reported_button'], table_info['seat_sequence'])
+            if debug:
+                logger.debug("Button seat is: %s", table_info['actual_button'])
+                
+        return table_info
+
+    def get_seat_positions(self, table_info):
+        # Seat -> position for every active player, computed once per hand
+        active_seats = table_info['seat_sequence']
+        try:
+            btn_idx = active_seats.index(table_info['actual_button'])
+        except ValueError:
+            logger.warning("Error determining position: button seat %s not found", table_info['actual_button'])
+            return {}
+
+        sequence = position_sequence(len(active_seats))
+        total_players = len(active_seats)
+        positions = {seat: sequence[(i - btn_idx) % total_players] for i, seat in enumerate(active_seats)}
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Positions: %s", ", ".join(
+                f"seat {player['seat']} {positions[player['seat']]} {player['name']}" for player in table_info['active_players']
+            ))
+
+        return positions
+
+    def get_hand_id(self, hand_lines):
+        if self.current_poker_site == "Red Star Poker":
+            return hand_lines.get('gamecode')
+        for line in hand_lines[:2]:
+            for pattern in HAND_ID_PATTERNS.get(self.current_poker_site, []):
+                match = pattern.search(line)
+                if match:
+                    return match.group(1)
+        return None
+
+    def process_hand(self, hand_lines):
+        try:
+            site = self.current_poker_site
+            hand_id = self.get_hand_id(hand_lines)
+            if hand_id is not None and (site, hand_id) in self.ingested_hands:
+                metrics.increment('hands_skipped')
+                logger.debug("Skipping hand %s, already counted", hand_id)
+                return
+            
+            with metrics.timer('parse'):
+                events, table_info = self.process_tokenized_hand(hand_lines)
+            metrics.increment('hands_parsed')
+            
+            if hand_id is not None:
+                self.tables[table_info['table_key']].recent_hands.append(hand_id)
+                self.mark_hand_ingested(site, hand_id)
+                # Kept so stats can be recomputed over history, import workers send it back instead
+                record = build_hand_record(site, hand_id, events, table_info)
+                if self.db is not None:
+                    self.hand_writer.add(record)
+                return record
+        
+        except Exception as e:
+            metrics.increment('hand_errors')
+            logger.warning("Error processing hand: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+        return None
+
+    def process_tokenized_hand(self, hand_lines):
+        # One pass over the hand, every consumer below reads the same events
+        tokenizer = TOKENIZERS[self.current_poker_site]
+        events = tokenizer.tokenize(hand_lines)
+        table_info = self.parse_table_info(hand_lines, events)
+        current_hand_players = set(player['name'] for player in table_info['active_players'])
+        
+        # Seated players and session stats are kept per table
+        table = self.table_for(table_info)
+        table.players = current_hand_players
+        table_info['table_key'] = table.key
+        session_stats = table.session_stats
+        
+        # Load anyone not cached yet in one query, new players start at zero
+        self.load_players(current_hand_players)
+
+        players_in_hand = set(current_hand_players)
+        pot_players = set(current_hand_players)
+        current_street = 'preflop'
+        initial_raiser = None
+        had_opportunity = set()
+        facing_3bet = set()
+        last_preflop_aggressor = None
+        cbet_opportunity_tracked = False
+        first_flop_action = True
+        # On some sites the blinds completing preflop is not a voluntary call
+        blind_players = () if tokenizer.count_blind_calls else (table_info['sb_player'], table_info['bb_player'])
+        
+        # First pass - get positions
+        table_info['positions'] = self.get_seat_positions(table_info)
+        for player in table_info['active_players']:
+            player_name = player['name']
+            position = table_info['positions'].get(player['seat'])
+            self.player_stats[player_name].position = position
+            session_stats[player_name].position = position
+        # This hand's counters per player, added to all-time and session stats at the end
+        counts = {player: [0] * len(STAT_FIELDS) for player in current_hand_players}
+
+        # Process actions
+        for event in events:
+            event_type = type(event)
+            if event_type is StreetEvent:
+                current_street = event.street
+                if current_street == 'flop':
+                    first_flop_action = True
+                    # Track cbet opportunity on the flop
+                    if not cbet_opportunity_tracked and last_preflop_aggressor and last_preflop_aggressor in pot_players:
+                        counts[last_preflop_aggressor][CBET_OPPORTUNITIES] += 1
+                        cbet_opportunity_tracked = True
+                continue
+            if event_type is not ActionEvent or event.player not in players_in_hand:
+                continue
+            
+            player = event.player
+            action = event.action
+            hand = counts[player]
+            hand[TOTAL_ACTIONS] += 1
+            
+            if current_street == 'preflop':
+                if action == RAISE:
+                    last_preflop_aggressor = player
+                    if initial_raiser is None:
+                        initial_raiser = player
+                        had_opportunity.update(pot_players - {player})
+                    elif player in had_opportunity:
+                        hand[THREEBETS] += 1
+                        facing_3bet.update(pot_players - {player})
+                    
+                    hand[VPIP_HANDS] += 1
+                    hand[PFR_HANDS] += 1
+                    hand[RAISES] += 1
+                elif action == CALL and player not in blind_players:
+                    hand[VPIP_HANDS] += 1
+                    hand[CALLS] += 1
+                elif action == CHECK:
+                    hand[CHECKS] += 1
+                elif action == FOLD:
+                    pot_players.remove(player)
+                    if player in facing_3bet:
+                        hand[FOLDED_TO_3BET] += 1
+            
+            else:  # postflop
+                # Track cbet when the last preflop aggressor makes first bet on flop
+                if current_street == 'flop' and first_flop_action and player == last_preflop_aggressor and action == BET:
+                    hand[CBETS] += 1
+                
+                if action == BET:
+                    hand[BETS] += 1
+                elif action == RAISE:
+                    hand[RAISES] += 1
+                elif action == CALL:
+                    hand[CALLS] += 1
+                elif action == CHECK:
+                    hand[CHECKS] += 1
+                elif action == FOLD:
+                    pot_players.remove(player)
+                
+                if current_street == 'flop':
+                    first_flop_action = False
+        
+        # Update final stats, one delta applied to both views
+        for player in players_in_hand:
+            hand = counts[player]
+            hand[TOTAL_HANDS] += 1
+            if player in had_opportunity:
+                hand[THREEBET_OPPORTUNITIES] += 1
+            if player in facing_3bet:
+                hand[FACED_3BET] += 1
+            
+            stats = self.player_stats[player]
+            session = session_stats[player]
+            stats.add(hand)
+            session.add(hand)
+            # Written to the database on the next flush
+            stats.player_type = self.determine_player_type(stats)
+            session.player_type = self.determine_player_type(session)
+            self.changed_players.add(player)
+            self.record_hand_counts(player, stats.position, hand)
+        table.changed_players |= players_in_hand
+        self.player_stats.touch(players_in_hand)
+        session_stats.touch(players_in_hand)
+        
+        return events, table_info
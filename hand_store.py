@@ -0,0 +1,174 @@
+"""Normalised storage of every ingested hand, its players and its actions.
+
+player_stats only keeps running totals. These tables keep the hands
+themselves, so new stats can be computed over history without a
+re-import. Streets, actions and positions are stored as small integers.
+"""
+from hand_tokenizer import ActionEvent, BlindEvent, DateEvent, StreetEvent, BET, CALL, CHECK, FOLD, RAISE
+
+STREET_CODES = {'preflop': 0, 'flop': 1, 'turn': 2, 'river': 3}
+ACTION_CODES = {FOLD: 0, CHECK: 1, CALL: 2, BET: 3, RAISE: 4, 'sb': 5, 'bb': 6}  # sb/bb are blind posts
+POSITION_CODES = {
+    'BTN': 0, 'SB': 1, 'BB': 2, 'UTG': 3, 'UTG+1': 4, 'UTG+2': 5,
+    'MP': 6, 'MP+1': 7, 'HJ': 8, 'CO': 9, 'Unknown': 10
+}
+
+# Seats in preflop acting order, for display
+POSITION_ORDER = ('UTG', 'UTG+1', 'UTG+2', 'MP', 'MP+1', 'HJ', 'CO', 'BTN', 'SB', 'BB')
+
+# Counters also kept per player per position, updated with every hand
+POSITION_FIELDS = (
+    'total_hands', 'vpip_hands', 'pfr_hands', 'threebets', 'threebet_opportunities',
+    'cbets', 'cbet_opportunities'
+)
+
+STREET_NAMES = {code: name for name, code in STREET_CODES.items()}
+ACTION_NAMES = {code: name for name, code in ACTION_CODES.items()}
+POSITION_NAMES = {code: name for name, code in POSITION_CODES.items()}
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS hands (
+        hand_pk INTEGER PRIMARY KEY,
+        site TEXT NOT NULL,
+        hand_id TEXT NOT NULL,
+        played_at TEXT,
+        table_name TEXT,
+        max_seats INTEGER,
+        button_seat INTEGER,
+        UNIQUE (site, hand_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS hand_players (
+        hand_pk INTEGER NOT NULL,
+        seat INTEGER NOT NULL,
+        player_name TEXT NOT NULL,
+        position INTEGER,
+        PRIMARY KEY (hand_pk, seat)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS actions (
+        hand_pk INTEGER NOT NULL,
+        seq INTEGER NOT NULL,
+        street INTEGER NOT NULL,
+        seat INTEGER,
+        action INTEGER NOT NULL,
+        amount REAL,
+        PRIMARY KEY (hand_pk, seq)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS player_position_stats (
+        player_name TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        {},
+        PRIMARY KEY (player_name, position)
+    ) WITHOUT ROWID
+    '''.format(',\n        '.join(f'{field} INTEGER NOT NULL DEFAULT 0' for field in POSITION_FIELDS)),
+    'CREATE INDEX IF NOT EXISTS idx_hand_players_player ON hand_players (player_name, hand_pk)',
+    'CREATE INDEX IF NOT EXISTS idx_hands_site_date ON hands (site, played_at)',
+    'CREATE INDEX IF NOT EXISTS idx_hands_date ON hands (played_at)',
+    'CREATE INDEX IF NOT EXISTS idx_hands_table ON hands (table_name)'
+)
+
+
+# Adds a batch of deltas to the positional counters
+POSITION_UPSERT = '''
+    INSERT INTO player_position_stats (player_name, position, {fields}) VALUES (?, ?, {values})
+    ON CONFLICT (player_name, position) DO UPDATE SET {updates}
+'''.format(
+    fields=', '.join(POSITION_FIELDS),
+    values=', '.join('?' * len(POSITION_FIELDS)),
+    updates=', '.join(f'{field} = {field} + excluded.{field}' for field in POSITION_FIELDS)
+)
+
+
+def create_tables(cursor):
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+
+def load_position_stats(db, player_names):
+    """{player: {position name: {field: count}}} for the given players."""
+    player_names = list(player_names)
+    if not player_names:
+        return {}
+    rows = db.read(
+        'SELECT player_name, position, {} FROM player_position_stats WHERE player_name IN ({})'.format(
+            ', '.join(POSITION_FIELDS), ','.join('?' * len(player_names))
+        ),
+        player_names
+    )
+    position_stats = {}
+    for row in rows:
+        position_stats.setdefault(row[0], {})[POSITION_NAMES[row[1]]] = dict(zip(POSITION_FIELDS, row[2:]))
+    return position_stats
+
+
+def build_hand_record(site, hand_id, events, table_info):
+    """Plain tuples for one hand, small enough to send back from an import worker."""
+    seats = {player['name']: player['seat'] for player in table_info['active_players']}
+    positions = table_info.get('positions', {})
+    players = tuple(
+        (seat, name, POSITION_CODES.get(positions.get(seat))) for name, seat in seats.items()
+    )
+
+    played_at = None
+    actions = []
+    street = STREET_CODES['preflop']
+    for event in events:
+        event_type = type(event)
+        if event_type is ActionEvent:
+            actions.append((len(actions), street, seats.get(event.player), ACTION_CODES[event.action], event.amount))
+        elif event_type is StreetEvent:
+            street = STREET_CODES[event.street]
+        elif event_type is BlindEvent:
+            actions.append((len(actions), street, seats.get(event.player), ACTION_CODES[event.blind], event.amount))
+        elif event_type is DateEvent:
+            played_at = event.played_at
+
+    return (site, hand_id, played_at, table_info.get('table_name'), table_info['max_seats'],
+            table_info['reported_button'], players, tuple(actions))
+
+
+class HandWriter:
+    """Queues hand records and writes them in the batch's transaction.
+
+    SQLite assigns hand_pk as each hand is inserted, so processes sharing the
+    database never reuse a key. Players and actions go in with one
+    executemany per table.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, record):
+        self.records.append(record)
+
+    def write(self, cursor):
+        players = []
+        actions = []
+        for site, hand_id, played_at, table_name, max_seats, button_seat, hand_players, hand_actions in self.records:
+            cursor.execute(
+                'INSERT OR IGNORE INTO hands (site, hand_id, played_at, table_name, max_seats, button_seat) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (site, hand_id, played_at, table_name, max_seats, button_seat)
+            )
+            if cursor.rowcount == 0:
+                continue  # Already stored, by another writer or earlier in this batch
+            hand_pk = cursor.lastrowid
+            players.extend((hand_pk,) + player for player in hand_players)
+            actions.extend((hand_pk,) + action for action in hand_actions)
+        cursor.executemany(
+            'INSERT OR IGNORE INTO hand_players (hand_pk, seat, player_name, position) VALUES (?, ?, ?, ?)',
+            players
+        )
+        cursor.executemany(
+            'INSERT OR IGNORE INTO actions (hand_pk, seq, street, seat, action, amount) VALUES (?, ?, ?, ?, ?, ?)',
+            actions
+        )
+
+    def clear(self):
+        self.records = []
@@ -0,0 +1,188 @@
+"""Single-pass tokenizers that turn one hand into a list of typed events.
+
+Each site's patterns are compiled once and every line is classified once.
+Table info, positions and stats are then all built from the same events.
+"""
+import re
+from collections import namedtuple
+
+DateEvent = namedtuple('DateEvent', 'played_at')  # 'YYYY-MM-DD HH:MM:SS' as written by the client
+TableEvent = namedtuple('TableEvent', 'max_seats name')
+SeatEvent = namedtuple('SeatEvent', 'seat player sitting_out')
+ButtonEvent = namedtuple('ButtonEvent', 'seat')
+BlindEvent = namedtuple('BlindEvent', 'blind player amount')
+StreetEvent = namedtuple('StreetEvent', 'street')
+ActionEvent = namedtuple('ActionEvent', 'player action amount')
+
+FOLD = 'fold'
+CHECK = 'check'
+CALL = 'call'
+BET = 'bet'
+RAISE = 'raise'
+
+ACTION_WORDS = {'folds': FOLD, 'checks': CHECK, 'calls': CALL, 'bets': BET, 'raises': RAISE}
+
+AMOUNT_PATTERN = re.compile(r"[\d,]+(?:\.\d+)?")
+
+
+def parse_amount(text):
+    # Last number on the line, so "raises 40 to 60" gives the total of 60
+    amounts = AMOUNT_PATTERN.findall(text or "")
+    return float(amounts[-1].replace(',', '')) if amounts else None
+
+
+class PokerStarsTokenizer:
+    site = "PokerStars"
+    count_blind_calls = False  # Blinds completing preflop do not count towards VPIP
+
+    date_pattern = re.compile(r"(\d{4})/(\d{2})/(\d{2}) (\d{1,2}):(\d{2}):(\d{2})")
+    table_pattern = re.compile(r"^Table '(.*)' (\d+)-max")
+    button_pattern = re.compile(r"Seat #(\d+) is the button")
+    seat_pattern = re.compile(r"^Seat (\d+): (.*?) \(.*in chips")
+    action_pattern = re.compile(r"^(.*?): (folds|checks|calls|bets|raises|posts small blind|posts big blind)(.*)$")
+    streets = {"*** FLOP ***": 'flop', "*** TURN ***": 'turn', "*** RIVER ***": 'river'}
+
+    def tokenize(self, hand_lines):
+        events = []
+        for line in hand_lines:
+            if line.startswith("Seat "):
+                match = self.seat_pattern.match(line)
+                if match:
+                    events.append(SeatEvent(int(match.group(1)), match.group(2), "sitting out" in line))
+            elif line.startswith("Table '"):
+                match = self.table_pattern.match(line)
+                if match:
+                    events.append(TableEvent(int(match.group(2)), match.group(1)))
+                match = self.button_pattern.search(line)
+                if match:
+                    events.append(ButtonEvent(int(match.group(1))))
+            elif line.startswith("*** "):
+                street = self.streets.get(line[:line.find("***", 4) + 3])
+                if street:
+                    events.append(StreetEvent(street))
+            elif line.startswith("PokerStars Hand #"):
+                match = self.date_pattern.search(line)
+                if match:
+                    year, month, day, hour, minute, second = match.groups()
+                    events.append(DateEvent(f"{year}-{month}-{day} {int(hour):02d}:{minute}:{second}"))
+            else:
+                match = self.action_pattern.match(line)
+                if match:
+                    player, verb, rest = match.groups()
+                    if verb.startswith("posts"):
+                        events.append(BlindEvent('sb' if 'small' in verb else 'bb', player, parse_amount(rest)))
+                    else:
+                        events.append(ActionEvent(player, ACTION_WORDS[verb], parse_amount(rest)))
+        return events
+
+    def actual_button(self, reported_button, seat_sequence):
+        # The seat after the reported button acts last preflop
+        return seat_sequence[(seat_sequence.index(reported_button) + 1) % len(seat_sequence)]
+
+
+class Poker888Tokenizer:
+    site = "888poker"
+    count_blind_calls = False
+
+    date_pattern = re.compile(r"\*\*\* (\d{2}) (\d{2}) (\d{4}) (\d{1,2}):(\d{2}):(\d{2})")
+    table_pattern = re.compile(r"^Table (.*) (\d+) Max")
+    button_pattern = re.compile(r"^Seat (\d+) is the button")
+    seat_pattern = re.compile(r"^Seat (\d+): (\S+) \(\s*[$€£]?[\d,.]+\s*\)")
+    blind_pattern = re.compile(r"^(\S+) posts (small|big) blind(.*)$")
+    action_pattern = re.compile(r"^(\S+) (folds|checks|calls|bets|raises)(.*)$")
+    streets = {"** Dealing flop **": 'flop', "** Dealing turn **": 'turn', "** Dealing river **": 'river'}
+
+    def tokenize(self, hand_lines):
+        events = []
+        dated = False
+        for line in hand_lines:
+            if line.startswith("Seat "):
+                match = self.seat_pattern.match(line)
+                if match:
+                    events.append(SeatEvent(int(match.group(1)), match.group(2), "sitting out" in line))
+                    continue
+                match = self.button_pattern.match(line)
+                if match:
+                    events.append(ButtonEvent(int(match.group(1))))
+            elif line.startswith("Table "):
+                match = self.table_pattern.match(line)
+                if match:
+                    events.append(TableEvent(int(match.group(2)), match.group(1)))
+            elif line.startswith("** "):
+                street = self.streets.get(line[:line.find("**", 3) + 2])
+                if street:
+                    events.append(StreetEvent(street))
+            else:
+                if not dated:
+                    # The date shares a line with the blinds, near the top of the hand
+                    match = self.date_pattern.search(line)
+                    if match:
+                        day, month, year, hour, minute, second = match.groups()
+                        events.append(DateEvent(f"{year}-{month}-{day} {int(hour):02d}:{minute}:{second}"))
+                        dated = True
+                        continue
+                match = self.action_pattern.match(line)
+                if match:
+                    player, verb, rest = match.groups()
+                    events.append(ActionEvent(player, ACTION_WORDS[verb], parse_amount(rest)))
+                    continue
+                match = self.blind_pattern.match(line)
+                if match:
+                    player, blind, rest = match.groups()
+                    events.append(BlindEvent('sb' if blind == 'small' else 'bb', player, parse_amount(rest)))
+        return events
+
+    def actual_button(self, reported_button, seat_sequence):
+        return reported_button
+
+
+class RedStarTokenizer:
+    site = "Red Star Poker"
+    count_blind_calls = True
+
+    # Type 0 = fold, Type 3 = call, Type 4 = check, Type 5 = bet, Type 23 = raise
+    action_types = {'0': FOLD, '3': CALL, '4': CHECK, '5': BET, '23': RAISE}
+    # Round 0 = blinds/antes, round 1 = preflop, round 2 = flop, etc.
+    round_streets = {2: 'flop', 3: 'turn', 4: 'river'}
+
+    def tokenize(self, hand_element):
+        events = []
+        players = hand_element.findall('./general/players/player')
+        played_at = hand_element.findtext('./general/startdate')
+        if played_at:
+            events.append(DateEvent(played_at.strip()))
+        if players:
+            # The table name is only in the session header, which is not part of a game
+            table_name = hand_element.findtext('./general/tablename')
+            events.append(TableEvent(min(10, max(int(p.get('seat', '0')) for p in players)), table_name))
+        for player in players:
+            seat = int(player.get('seat', '0'))
+            name = player.get('name', '')
+            if seat > 0 and name:
+                events.append(SeatEvent(seat, name, player.get('chips') is None))
+                if player.get('dealer', '0') == '1':
+                    events.append(ButtonEvent(seat))
+
+        for round_idx, round_element in enumerate(hand_element.findall('round')):
+            street = self.round_streets.get(round_idx)
+            if street:
+                events.append(StreetEvent(street))
+            for action in round_element.findall('action'):
+                player = action.get('player')
+                action_type = action.get('type')
+                if round_idx == 0 and action_type in ('1', '2') and player:
+                    # Type 1 = small blind, Type 2 = big blind
+                    events.append(BlindEvent('sb' if action_type == '1' else 'bb', player, parse_amount(action.get('sum'))))
+                elif action_type in self.action_types:
+                    events.append(ActionEvent(player, self.action_types[action_type], parse_amount(action.get('sum'))))
+        return events
+
+    def actual_button(self, reported_button, seat_sequence):
+        return reported_button
+
+
+TOKENIZERS = {
+    "PokerStars": PokerStarsTokenizer(),
+    "888poker": Poker888Tokenizer(),
+    "Red Star Poker": RedStarTokenizer()
+}
@@ -0,0 +1,473 @@
+"""File watching and the background thread that ingests hand histories.
+
+Watchdog events are debounced per file, new content is read on the
+debouncer thread and queued for the IngestionWorker, which owns all
+parsing and live database writes. Archive imports run on a thread of
+their own. The GUI only receives snapshots.
+"""
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from PyQt6.QtCore import QThread, pyqtSignal
+from watchdog.events import FileSystemEventHandler
+
+from bulk_import import import_folder
+from hand_history import HandHistoryProcessor
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Byte markers that start a hand in text hand histories
+HAND_START_MARKERS = (b"PokerStars Hand #", b"888poker Hand History for Game", b"#Game No :")
+
+# Hands in text files are separated by blank lines
+BLANK_LINE_PATTERN = re.compile(rb'\n[ \t\r]*\n')
+# 888poker writes the game number on the line before its hand header
+GAME_NUMBER_MARKER = b"#Game No :"
+
+# One complete hand in a Red Star XML session file
+REDSTAR_GAME_PATTERN = re.compile(rb'<game\b[^>]*>.*?</game>', re.DOTALL)
+
+QUIET_PERIOD = 0.3  # Seconds without new events before a file is read
+MAX_READ_DELAY = 2.0  # A file that never goes quiet is still read this often
+
+def complete_hands_end(data):
+    """Offset in data where its complete hands end.
+
+    A hand is complete once a blank line follows it, or once the next hand's
+    header has been written without one.
+    """
+    end = max((match.end() for match in BLANK_LINE_PATTERN.finditer(data)), default=0)
+    header = max(data.rfind(marker) for marker in HAND_START_MARKERS)
+    if header > end:
+        header = data.rfind(b'\n', 0, header) + 1
+        previous = data.rfind(b'\n', 0, max(header - 1, 0)) + 1
+        if GAME_NUMBER_MARKER in data[previous:header]:
+            header = previous
+        end = max(end, header)
+    return end
+
+
+class FileEventDebouncer:
+    """Merges bursts of events per path into one read once the file goes quiet.
+
+    Reads run one at a time on a single thread, so the observer thread is
+    never blocked and a busy table cannot hold up the others.
+    """
+
+    def __init__(self, callback, quiet_period=QUIET_PERIOD, max_delay=MAX_READ_DELAY):
+        self.callback = callback
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self.pending = {}  # path -> (first event time, last event time)
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.running = True
+        self.latency = {
+            'events': 0,
+            'reads': 0,
+            'total_latency': 0.0,
+            'max_latency': 0.0,
+            'last_latency': 0.0
+        }
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def touch(self, path):
+        now = time.monotonic()
+        with self.lock:
+            self.latency['events'] += 1
+            first_event = self.pending[path][0] if path in self.pending else now
+            self.pending[path] = (first_event, now)
+            self.changed.notify()
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+            self.changed.notify_all()
+        self.thread.join()
+
+    def get_latency_stats(self):
+        # Event-to-ingest latency: first event of a burst until its read finished
+        with self.lock:
+            reads = self.latency['reads']
+            return {
+                'events': self.latency['events'],
+                'reads': reads,
+                'pending': len(self.pending),
+                'avg_ms': self.latency['total_latency'] / max(1, reads) * 1000,
+                'max_ms': self.latency['max_latency'] * 1000,
+                'last_ms': self.latency['last_latency'] * 1000
+            }
+
+    def _due_at(self, first_event, last_event):
+        return min(last_event + self.quiet_period, first_event + self.max_delay)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while self.running:
+                    now = time.monotonic()
+                    due = [path for path, times in self.pending.items() if self._due_at(*times) <= now]
+                    if due:
+                        break
+                    next_due = min((self._due_at(*times) for times in self.pending.values()), default=None)
+                    self.changed.wait(None if next_due is None else next_due - now)
+                if not self.running:
+                    return
+                ready = [(path, self.pending.pop(path)[0]) for path in due]
+
+            for path, first_event in ready:
+                try:
+                    self.callback(path)
+                except Exception as e:
+                    logger.exception("Error reading %s: %s", path, e)
+                latency = time.monotonic() - first_event
+                with self.lock:
+                    self.latency['reads'] += 1
+                    self.latency['total_latency'] += latency
+                    self.latency['max_latency'] = max(self.latency['max_latency'], latency)
+                    self.latency['last_latency'] = latency
+
+class PokerHandHistoryWatcher(FileSystemEventHandler):
+    def __init__(self, site, ingestion_worker):
+        self.site = site
+        self.ingestion_worker = ingestion_worker
+        # Per-file read offsets, persisted so restarts resume where they stopped.
+        # Only offsets whose hands are committed go in file_offsets, reads still
+        # queued for the worker continue from queued_offsets
+        self.file_offsets = ingestion_worker.processor.load_file_offsets()
+        self.queued_offsets = {}
+        self.offsets_lock = threading.Lock()
+        self.verified_files = set()
+        self.debouncer = FileEventDebouncer(self.process_file)
+        ingestion_worker.offsets_committed.connect(self.on_offsets_committed)
+        ingestion_worker.batch_failed.connect(self.on_batch_failed)
+        
+    def on_modified(self, event):
+        if not event.is_directory and event.src_path.endswith(self.file_extension()):
+            # Clients flush several times per hand, the debouncer reads once they settle
+            self.debouncer.touch(event.src_path)
+    
+    def file_extension(self):
+        return '.xml' if self.site == "Red Star Poker" else '.txt'
+
+    def process_file(self, file_path):
+        if self.site == "Red Star Poker":
+            self.process_xml_file(file_path)
+        else:
+            self.process_text_file(file_path)
+
+    def stop(self):
+        self.ingestion_worker.offsets_committed.disconnect(self.on_offsets_committed)
+        self.ingestion_worker.batch_failed.disconnect(self.on_batch_failed)
+        self.debouncer.stop()
+
+    def read_state(self, file_path):
+        with self.offsets_lock:
+            return self.queued_offsets.get(file_path) or self.file_offsets.get(file_path)
+
+    def queue_read(self, file_path, state):
+        with self.offsets_lock:
+            self.queued_offsets[file_path] = state
+
+    def on_offsets_committed(self, file_offsets):
+        # Called on the worker thread once a batch's hands are in the database
+        with self.offsets_lock:
+            for file_path, state in file_offsets.items():
+                self.file_offsets[file_path] = state
+                if self.queued_offsets.get(file_path) is state:
+                    del self.queued_offsets[file_path]
+
+    def on_batch_failed(self, file_paths):
+        # Read these files again from their committed offsets; hands the processor
+        # still holds are skipped by hand id
+        with self.offsets_lock:
+            for file_path in file_paths:
+                self.queued_offsets.pop(file_path, None)
+        for file_path in file_paths:
+            self.debouncer.touch(file_path)
+
+    def get_latency_stats(self):
+        return self.debouncer.get_latency_stats()
+
+    def catch_up(self, folder):
+        # Queue what was written while we were not running
+        last_session = max((state['updated_at'] or 0 for state in self.file_offsets.values()), default=None)
+        for file_path in sorted(Path(folder).rglob('*' + self.file_extension())):
+            file_path = str(file_path)
+            if file_path in self.file_offsets:
+                self.debouncer.touch(file_path)
+            elif last_session is not None and os.path.getmtime(file_path) > last_session:
+                self.debouncer.touch(file_path)
+
+    def resume_offset(self, file_path, stat):
+        state = self.read_state(file_path)
+        if state is None:
+            return 0
+        if state['inode'] != stat.st_ino:
+            logger.info("File was replaced, reading from start: %s", file_path)
+            return 0
+        if stat.st_size < state['offset']:
+            logger.info("File size decreased, resetting position: %s", file_path)
+            return 0
+        # After a restart make sure the stored offset still ends the same hand
+        if file_path not in self.verified_files and state['last_hand_length']:
+            with open(file_path, 'rb') as file:
+                file.seek(state['offset'] - state['last_hand_length'])
+                last_hand = file.read(state['last_hand_length'])
+            if hashlib.sha1(last_hand).hexdigest() != state['last_hand_checksum']:
+                logger.info("File contents changed, reading from start: %s", file_path)
+                return 0
+        return state['offset']
+
+    def process_text_file(self, file_path):
+        try:
+            stat = os.stat(file_path)
+            offset = self.resume_offset(file_path, stat)
+            self.verified_files.add(file_path)
+
+            with open(file_path, 'rb') as file:
+                file.seek(offset)
+                data = file.read()
+
+            # A client can pause in the middle of a hand, so the last one is left for a
+            # later read until its separator or the next hand has been written
+            end = complete_hands_end(data)
+            if end == 0:
+                logger.debug("No new complete hands in %s", file_path)
+                return
+            chunk = data[:end]
+
+            metrics.increment('bytes_read', len(chunk))
+            logger.debug("Queueing %d bytes of new content", len(chunk))
+            hand_start = max(chunk.rfind(marker) for marker in HAND_START_MARKERS)
+            last_hand = chunk[hand_start:] if hand_start >= 0 else chunk[-4096:]
+            state = {
+                'offset': offset + end,
+                'inode': stat.st_ino,
+                'size': stat.st_size,
+                'last_hand_checksum': hashlib.sha1(last_hand).hexdigest(),
+                'last_hand_length': len(last_hand),
+                'updated_at': time.time()
+            }
+            # The offset is only stored once the worker has written these hands
+            self.queue_read(file_path, state)
+            self.ingestion_worker.submit_text(file_path, chunk.decode('utf-8-sig', errors='replace'), state)
+        except Exception as e:
+            # Keep the stored offset, rereading from 0 would count every hand twice
+            logger.exception("Error processing file %s: %s", file_path, e)
+            
+    def process_xml_file(self, file_path):
+        try:
+            stat = os.stat(file_path)
+            state = self.read_state(file_path)
+            offset = state['offset'] if state else 0
+            last_game_id = state['last_game_id'] if state else None
+
+            with open(file_path, 'rb') as file:
+                if offset and (state['inode'] != stat.st_ino or stat.st_size < offset):
+                    offset = 0
+                elif offset:
+                    # The stored offset must still sit right after a closing </game>
+                    file.seek(offset - len(b'</game>'))
+                    if file.read(len(b'</game>')) != b'</game>':
+                        offset = 0
+                if offset == 0 and state:
+                    logger.info("XML file was rewritten, rescanning: %s", file_path)
+                file.seek(offset)
+                data = file.read()
+            metrics.increment('bytes_read', len(data))
+
+            # The closing </session> is rewritten as games are added, so only
+            # complete <game> elements are taken and the offset ends on the last one
+            games = []
+            end = 0
+            for match in REDSTAR_GAME_PATTERN.finditer(data):
+                games.append(ET.fromstring(match.group(0)))
+                end = match.end()
+
+            if offset == 0 and last_game_id is not None:
+                # Skip the games counted before the file was rewritten
+                game_ids = [game.get('gamecode') for game in games]
+                if last_game_id in game_ids:
+                    games = games[game_ids.index(last_game_id) + 1:]
+
+            if not games:
+                logger.debug("No new content in XML file %s", file_path)
+                if end == 0:
+                    return
+            else:
+                logger.debug("Queueing %d new games from %s", len(games), file_path)
+                last_game_id = games[-1].get('gamecode')
+
+            state = {
+                'offset': offset + end,
+                'inode': stat.st_ino,
+                'size': stat.st_size,
+                'last_hand_checksum': None,
+                'last_hand_length': 0,
+                'last_game_id': last_game_id,
+                'updated_at': time.time()
+            }
+            self.queue_read(file_path, state)
+            self.ingestion_worker.submit_games(file_path, games, state)
+        except Exception as e:
+            # Keep the stored offset so earlier games are not counted again
+            logger.exception("Error processing XML file %s: %s", file_path, e)
+
+
+BATCH_LIMIT = 50  # Queued chunks handled per database transaction
+FLUSH_INTERVAL = 10.0  # Seconds between writes of the cached player rows
+FLUSH_DIRTY_LIMIT = 500  # Dirty players that force an early write
+
+class IngestionWorker(QThread):
+    """Parses and stores queued hand histories off the GUI thread.
+
+    Whatever has queued up is processed as one batch and journaled in one
+    transaction, then stats_updated carries copies of the changed players
+    and of the tables they were seen at.
+    The processor's cache is authoritative; player rows are written behind
+    it every FLUSH_INTERVAL, once enough players are dirty, and on stop.
+    """
+
+    stats_updated = pyqtSignal(object)
+    import_progress = pyqtSignal(object)
+    offsets_committed = pyqtSignal(object)  # file path -> offset state, once written
+    batch_failed = pyqtSignal(object)  # files whose queued content was not written
+
+    def __init__(self, db_path, site):
+        super().__init__()
+        self.processor = HandHistoryProcessor(db_path, site)
+        self.queue = queue.Queue()
+        self.import_thread = None
+
+    def submit_text(self, file_path, content, state):
+        self.queue.put(('text', file_path, content, state))
+
+    def submit_games(self, file_path, games, state):
+        self.queue.put(('games', file_path, games, state))
+
+    def submit_import(self, folder):
+        # Queued so it starts with the site chosen before it
+        self.queue.put(('import', None, folder, None))
+
+    def set_site(self, site):
+        self.queue.put(('site', None, site, None))
+
+    def stop(self):
+        self.queue.put(None)
+        self.wait()
+        if self.import_thread is not None:
+            self.import_thread.join()
+        self.processor.close()
+
+    def start_import(self, folder):
+        if self.import_thread is not None and self.import_thread.is_alive():
+            logger.warning("An import is already running, %s was not imported", folder)
+            return
+        # Its own processor on the same database, the writer lock orders its transactions
+        # with live batches. Sharing the hand ids keeps either from counting a hand twice
+        importer = HandHistoryProcessor(self.processor.db_path, self.processor.current_poker_site,
+                                        db=self.processor.db)
+        importer.ingested_hands = self.processor.ingested_hands
+        self.import_thread = threading.Thread(target=self.run_import, args=(importer, folder), daemon=True)
+        self.import_thread.start()
+
+    def run_import(self, importer, folder):
+        try:
+            import_folder(importer, folder, progress=self.import_progress.emit)
+        except Exception as e:
+            logger.exception("Error importing %s: %s", folder, e)
+        # Players cached here before the import are stale
+        self.queue.put(('imported', None, folder, None))
+
+    def run(self):
+        dirty_since = None
+        while True:
+            # Wake up for the next write-behind flush even when nothing is queued
+            timeout = None if dirty_since is None else max(0.0, dirty_since + FLUSH_INTERVAL - time.monotonic())
+            try:
+                batch = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < BATCH_LIMIT:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            items = [item for item in batch if item is not None]
+            if items:
+                try:
+                    self.process_batch(items)
+                except Exception as e:
+                    logger.exception("Error ingesting hand histories: %s", e)
+                    self.batch_failed.emit({file_path for kind, file_path, _, _ in items
+                                            if kind in ('text', 'games')})
+
+            stopping = len(items) < len(batch)
+            dirty_players = self.processor.dirty_players
+            if dirty_players and dirty_since is None:
+                dirty_since = time.monotonic()
+            if stopping or dirty_players and (
+                    len(dirty_players) >= FLUSH_DIRTY_LIMIT or time.monotonic() - dirty_since >= FLUSH_INTERVAL):
+                try:
+                    self.processor.flush()
+                    dirty_since = None
+                except Exception as e:
+                    # The journal still holds the changes, try again after another interval
+                    dirty_since = time.monotonic()
+                    logger.exception("Error writing player stats: %s", e)
+            if stopping:
+                return
+
+    def process_batch(self, batch):
+        processor = self.processor
+        file_offsets = {}
+        for kind, file_path, content, state in batch:
+            if kind == 'site':
+                processor.reset_session(content)
+                continue
+            if kind == 'import':
+                self.start_import(content)
+                continue
+            if kind == 'imported':
+                processor.forget_stored_players()
+                continue
+            if kind == 'text':
+                processor.process_new_hands(content, file_path)
+            else:
+                processor.process_redstar_games(content, file_path)
+            file_offsets[file_path] = state
+
+        changed_players = processor.journal_batch(file_offsets)
+        self.offsets_committed.emit(file_offsets)
+        updated_tables, closed_tables = processor.take_table_updates()
+        self.stats_updated.emit({
+            'site': processor.current_poker_site,
+            'player_stats': {player: processor.player_stats[player].as_dict() for player in changed_players},
+            # Only tables that had a hand in this batch, each with the session stats that changed there
+            'tables': {
+                table.key: {
+                    'name': table.name,
+                    'players': set(table.players),
+                    'recent_hands': tuple(table.recent_hands),
+                    'session_stats': {player: table.session_stats[player].as_dict() for player in players}
+                }
+                for table, players in updated_tables
+            },
+            'closed_tables': closed_tables,
+            'recent_stats': {
+                player: {'window': processor.recent_stats[player].window_view(),
+                         'decayed': processor.recent_stats[player].decayed_view()}
+                for player in changed_players if player in processor.recent_stats
+            }
+        })
@@ -0,0 +1,105 @@
+"""Cheap in-process counters and timers for the ingestion pipeline.
+
+Hot paths bump a counter or wrap a stage in a timer instead of printing.
+The HUD shows a one-line summary in the status bar and the full report
+can be dumped on demand.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Stages timed per hand, in report order
+STAGES = ('parse', 'db', 'render')
+
+
+def configure_logging(level=None):
+    # Warnings and errors only unless HUD_LOG_LEVEL asks for more
+    level = level or os.environ.get('HUD_LOG_LEVEL', 'WARNING')
+    logging.basicConfig(level=level.upper(), format=LOG_FORMAT)
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.counters = {}
+        self.timers = {}  # name -> [calls, total seconds, max seconds]
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name, seconds):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def reset(self):
+        with self.lock:
+            self.started = time.monotonic()
+            self.counters.clear()
+            self.timers.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'uptime': time.monotonic() - self.started,
+                'counters': dict(self.counters),
+                'timers': {name: tuple(timer) for name, timer in self.timers.items()}
+            }
+
+    def per_hand_ms(self, snapshot, stage):
+        # Parse and database time are spread over the hands parsed, rendering is per refresh
+        calls, total, _ = snapshot['timers'].get(stage, (0, 0.0, 0.0))
+        divisor = calls if stage == 'render' else snapshot['counters'].get('hands_parsed', 0)
+        return total / divisor * 1000 if divisor else 0.0
+
+    def format_summary(self):
+        snapshot = self.snapshot()
+        counters = snapshot['counters']
+        return (f"{counters.get('hands_parsed', 0)} hands, {counters.get('bytes_read', 0) / 1024:.0f} KB read | "
+                f"parse {self.per_hand_ms(snapshot, 'parse'):.2f} ms/hand, "
+                f"db {self.per_hand_ms(snapshot, 'db'):.2f} ms/hand, "
+                f"render {self.per_hand_ms(snapshot, 'render'):.0f} ms")
+
+    def format_report(self):
+        snapshot = self.snapshot()
+        lines = [f"Metrics after {snapshot['uptime']:.0f} s"]
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"  {name:<20} {value}")
+        for name, (calls, total, longest) in sorted(snapshot['timers'].items()):
+            lines.append(f"  {name:<20} {calls} calls, {total * 1000:.1f} ms total, "
+                         f"{total / calls * 1000:.2f} ms avg, {longest * 1000:.2f} ms max")
+        for stage in STAGES:
+            if stage in snapshot['timers']:
+                unit = "refresh" if stage == 'render' else "hand"
+                lines.append(f"  {stage + ' per ' + unit:<20} {self.per_hand_ms(snapshot, stage):.3f} ms")
+        return "\n".join(lines)
+
+    def dump(self, stream=None):
+        stream = stream or sys.stderr
+        stream.write(self.format_report() + "\n")
+        stream.flush()
+
+
+# Shared by every thread in the process
+metrics = Metrics()
@@ -6,16 +6,20 @@ import tkinter as tk
 from tkinter import ttk
 from itertools import combinations
 from collections import defaultdict
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
 from collections import Counter
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLabel, QSpinBox, QPushButton,
                             QFrame, QGridLayout, QTextEdit, QSizePolicy, QMenu)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QEvent
 from PyQt6.QtGui import QFont, QColor, QPalette, QIcon
 # monsterhand.py
-from simulation import HandRank, Card, Deck, HandEvaluator, simulate_single_round
+from simulation import (HandRank, Card, Deck, HandEvaluator, split_batches,
+                        summarize_counts, STRATEGY_SAMPLE_FACTORS)
 from analyser import LiveHandHistoryAnalyzer
+from equity_service import EquityServiceClient
+from sim_worker import BACKENDS, run_batches
+from sim_scheduler import get_scheduler
 
 import numpy as np
 import math
@@ -38,7 +42,9 @@ if sys.platform.startswith('win'):
 
 class SimulationWorker(QThread):
     simulation_finished = pyqtSignal(dict)
-    def __init__(self, hole_cards, community_cards, available_cards, num_players, unknown_cards, sample_size_multiplier=1.0):
+    def __init__(self, hole_cards, community_cards, available_cards, num_players, unknown_cards, sample_size_multiplier=1.0,
+                 equity_client=None, sampling_strategy='stratified', backend=None,
+                 scheduler=None, scheduler_client=None):
         super().__init__()
         self.hole_cards = hole_cards
         self.community_cards = community_cards
@@ -46,6 +52,12 @@ class SimulationWorker(QThread):
         self.num_players = num_players
         self.unknown_cards = unknown_cards
         self.sample_size_multiplier = sample_size_multiplier
+        self.equity_client = equity_client
+        self.sampling_strategy = sampling_strategy
+        self.backend = backend  # 'process', 'thread' or 'inline', None picks per interpreter
+        # Shared scheduler used instead of a private pool when given
+        self.scheduler = scheduler
+        self.scheduler_client = scheduler_client
     def run(self):
         results = self.simulate_hand()
         self.simulation_finished.emit(results)
@@ -115,7 +127,9 @@ class SimulationWorker(QThread):
             base_samples = int(base_samples * 0.8)  # Strong made hands need fewer samples
         elif hand.rank == HandRank.THREE_OF_KIND:
             base_samples = int(base_samples * 0.9)
-        final_samples = int(base_samples * player_multiplier * self.sample_size_multiplier)
+        # Variance-reduced samplers reach the same accuracy with fewer rounds
+        strategy_factor = STRATEGY_SAMPLE_FACTORS[self.sampling_strategy].get(len(self.community_cards), 1.0)
+        final_samples = int(base_samples * player_multiplier * self.sample_size_multiplier * strategy_factor)
         return max(1000, min(final_samples, 10000))
     def simulate_hand(self):
         if len(self.hole_cards) < 2:
@@ -123,6 +137,14 @@ class SimulationWorker(QThread):
         if self.num_players < 2:
             return {"win": 100, "tie": 0, "lose": 0}
         num_samples = self.determine_sample_size()
+        if self.equity_client is not None:
+            try:
+                return self.equity_client.calculate(self.hole_cards, self.community_cards,
+                                                    self.num_players, self.unknown_cards, num_samples,
+                                                    self.sampling_strategy)
+            except OSError as e:
+                # Service went away, fall back to a local pool
+                print(f"Equity service unavailable, simulating locally: {str(e)}")
         known_cards = set(self.hole_cards + self.community_cards)
         available_cards = []
         for rank in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']:
@@ -130,27 +152,22 @@ class SimulationWorker(QThread):
                 card = Card(rank, suit)
                 if card not in known_cards:
                     available_cards.append(card)
-        args = ((self.hole_cards, self.community_cards, available_cards,
-                self.num_players, self.unknown_cards) for _ in range(num_samples))
         num_processes = cpu_count()
+        # A few batches per worker keeps the pool balanced without pickling every round
+        args = [(self.hole_cards, self.community_cards, available_cards,
+                 self.num_players, self.unknown_cards, batch_size, self.sampling_strategy)
+                for batch_size in split_batches(num_samples, num_processes * 4)]
         try:
-            with Pool(processes=num_processes) as pool:
-                results = pool.map(simulate_single_round, args)
+            if self.scheduler is not None:
+                return summarize_counts(self.scheduler.submit(self.scheduler_client, args).wait())
+            batch_counts = run_batches(args, self.backend, num_processes)
         except Exception as e:
             return {"win": 0, "tie": 0, "lose": 0}
-        result_counts = {
-            "win": results.count("win"),
-            "tie": results.count("tie"),
-            "lose": results.count("lose")
-        }
-        total = sum(result_counts.values())
-        if total == 0:
-            return {"win": 0, "tie": 0, "lose": 0}
-        return {
-            "win": round((result_counts["win"] / total) * 100, 2),
-            "tie": round((result_counts["tie"] / total) * 100, 2),
-            "lose": round((result_counts["lose"] / total) * 100, 2)
-        }
+        result_counts = {"win": 0, "tie": 0, "lose": 0}
+        for counts in batch_counts:
+            for outcome, count in counts.items():
+                result_counts[outcome] += count
+        return summarize_counts(result_counts)
     def select_card(self, rank: str, suit: str):
         card = Card(rank, suit)
         suit_colors = {
@@ -208,6 +225,12 @@ class PokerCalculator(QMainWindow):
         self.hole_cards = []
         self.community_cards = []
         self.simulation_worker = None
+        # Use the shared local equity service when one is running
+        equity_client = EquityServiceClient()
+        self.equity_client = equity_client if equity_client.is_available() else None
+        # Every calculator window shares one worker budget
+        self.scheduler = get_scheduler()
+        self.scheduler_client = self.scheduler.register_client()
         self.card_buttons = []  # Store all card buttons
         self.players_label = QLabel("Players:")
         self.hole_label = QLabel("Hole:")
@@ -221,6 +244,15 @@ class PokerCalculator(QMainWindow):
         self.community_label.setText("C:")
         self.setup_gui()
         self.default_player_count = 9
+    def changeEvent(self, event):
+        if event.type() == QEvent.Type.ActivationChange and self.isActiveWindow():
+            self.scheduler.set_focus(self.scheduler_client)
+        super().changeEvent(event)
+
+    def closeEvent(self, event):
+        self.scheduler.unregister_client(self.scheduler_client)
+        super().closeEvent(event)
+
     def open_new_calculator(self):
         new_calc = PokerCalculator()
         new_calc.setGeometry(self.geometry())
@@ -556,6 +588,20 @@ class PokerCalculator(QMainWindow):
         # Add hand history analyzer option
         history_action = menu.addAction("Hand History Analyzer")
         history_action.triggered.connect(self.open_history_analyzer)
+
+        # Shared simulation queue metrics
+        scheduler_action = menu.addAction("Simulation Queue Stats")
+        scheduler_action.triggered.connect(self.show_scheduler_stats)
+
+        # Backend of the shared scheduler, for every calculator window
+        backend_menu = QMenu("Simulation Backend", menu)
+        backend_menu.setStyleSheet(menu.styleSheet())
+        for backend in BACKENDS:
+            action = backend_menu.addAction(backend.capitalize())
+            action.setCheckable(True)
+            action.setChecked(backend == self.scheduler.backend)
+            action.triggered.connect(lambda checked, x=backend: self.set_simulation_backend(x))
+        menu.addMenu(backend_menu)
         
         # Add player count submenu
         player_menu = QMenu("Set Default Players", menu)
@@ -571,6 +617,36 @@ class PokerCalculator(QMainWindow):
         # Show menu below the button
         menu.exec(self.info_button.mapToGlobal(self.info_button.rect().bottomLeft()))
 
+    def set_simulation_backend(self, backend):
+        self.scheduler = get_scheduler(backend)
+
+    def show_scheduler_stats(self):
+        metrics = self.scheduler.get_metrics()
+        lines = [
+            f"Backend: {metrics['backend']} ({metrics['workers']} workers)",
+            f"Focused window: {metrics['focused'] or 'None'}",
+            f"Batches in flight: {metrics['in_flight']}",
+            f"Jobs submitted/completed: {metrics['jobs_submitted']}/{metrics['jobs_completed']}",
+            f"Batches dispatched: {metrics['batches_dispatched']}",
+            f"Pools replaced after a lost batch: {metrics['stalled_pools']}",
+            f"Queue wait avg/max: {metrics['avg_queue_wait_ms']:.1f} / {metrics['max_queue_wait_ms']:.1f} ms",
+            f"Job time avg: {metrics['avg_job_ms']:.1f} ms",
+            "",
+            "Queued batches per window:"
+        ]
+        lines.extend(f"  {name}: {count}" for name, count in metrics['queued_batches'].items())
+
+        stats_window = QTextEdit()
+        stats_window.setWindowTitle("Simulation Queue Stats")
+        stats_window.setReadOnly(True)
+        stats_window.setStyleSheet("background-color: #2d2d2d; color: white; border: 1px solid #404040;")
+        stats_window.setGeometry(200, 200, 360, 280)
+        stats_window.setText("\n".join(lines))
+        stats_window.show()
+
+        # Keep a reference to prevent garbage collection
+        self.scheduler_stats_window = stats_window
+
     def open_history_analyzer(self):
         self.history_analyzer = LiveHandHistoryAnalyzer()
         self.history_analyzer.show()
@@ -1500,7 +1576,10 @@ Only possibilities with 0.1% or greater chance are shown.
             self.community_cards,
             available_cards,
             self.current_player_count,
-            5 - len(self.community_cards)
+            5 - len(self.community_cards),
+            equity_client=self.equity_client,
+            scheduler=self.scheduler,
+            scheduler_client=self.scheduler_client
         )
 
         # Disconnect any existing signal connections (if applicable)
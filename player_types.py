@@ -0,0 +1,207 @@
+"""Player type classification against profile ranges widened for small samples.
+
+The widened ranges only depend on how many hands a player has, so they
+are precomputed per sample-size bucket. classify() scores one player for
+the live parser; classify_many() scores a whole table of players in one
+NumPy pass, which reclassify_database() uses to retype everyone stored
+whenever the profile ranges change.
+
+    python player_types.py --db "C:/Users/me/poker_stats.db"
+"""
+import argparse
+import math
+from pathlib import Path
+
+
+class PlayerType:
+    TAG = "Tight Aggressive"
+    LAG = "Loose Aggressive"
+    NIT = "Nit"
+    FISH = "Fish"
+    MANIAC = "Maniac"
+    UNKNOWN = "Unknown"
+    INITIAL = "In"
+
+# Base ranges per type for VPIP%, PFR%, AF and 3-bet%
+BASE_PROFILES = {
+    PlayerType.TAG: {'vpip': (20, 26), 'pfr': (16, 22), 'af': (2.0, 3.0), 'threeb': (6, 9)},
+    PlayerType.LAG: {'vpip': (28, 35), 'pfr': (22, 28), 'af': (2.5, 3.5), 'threeb': (9, 13)},
+    PlayerType.NIT: {'vpip': (12, 16), 'pfr': (8, 12), 'af': (1.2, 1.8), 'threeb': (2, 4)},
+    PlayerType.FISH: {'vpip': (35, 50), 'pfr': (12, 18), 'af': (0.8, 1.2), 'threeb': (2, 5)},
+    PlayerType.MANIAC: {'vpip': (40, 60), 'pfr': (30, 45), 'af': (3.5, 5.0), 'threeb': (15, 25)}
+}
+PROFILE_TYPES = tuple(BASE_PROFILES)
+PROFILE_STATS = ('vpip', 'pfr', 'af', 'threeb')
+
+# How far each range is widened at 20 hands, shrinking with log(hands), and its floor
+ADJUSTMENTS = {'vpip': (0.4, 0.02), 'pfr': (0.45, 0.02), 'af': (0.6, 0.02), 'threeb': (0.7, 0.03)}
+STAT_WEIGHTS = {'vpip': 1.0, 'pfr': 1.0, 'af': 0.7, 'threeb': 0.5}
+
+# Counters classify() reads
+CLASSIFY_FIELDS = (
+    'total_hands', 'vpip_hands', 'pfr_hands', 'bets', 'raises', 'calls', 'checks',
+    'threebets', 'threebet_opportunities'
+)
+
+MIN_HANDS = 10         # Fewer hands than this is UNKNOWN
+INITIAL_HANDS = 20     # Fewer hands than this is INITIAL
+UNSURE_HANDS = 100     # Below this a poor match is INITIAL rather than UNKNOWN
+MAX_DISTANCE = 30      # Worse matches than this are not typed
+
+# Sample sizes up to EXACT_HANDS get their own bucket, larger ones share
+# buckets BUCKET_GROWTH apart, where the widening barely changes
+EXACT_HANDS = 2000
+BUCKET_GROWTH = 1.01
+
+
+def sample_bucket(total_hands):
+    # Hand count the bucket's profiles were computed for
+    if total_hands <= EXACT_HANDS:
+        return max(0, total_hands)
+    steps = math.floor(math.log(total_hands / EXACT_HANDS) / math.log(BUCKET_GROWTH))
+    return EXACT_HANDS * BUCKET_GROWTH ** steps
+
+
+def adjusted_profiles(total_hands):
+    """((type, ((min, max) per PROFILE_STATS)), ...) widened for total_hands."""
+    scale = math.log(20) / math.log(max(20, total_hands))
+    profiles = []
+    for player_type, profile in BASE_PROFILES.items():
+        ranges = []
+        for stat in PROFILE_STATS:
+            min_val, max_val = profile[stat]
+            factor, floor = ADJUSTMENTS[stat]
+            adjustment = (max_val - min_val) * max(floor, factor * scale)
+            ranges.append((max(0, min_val - adjustment), max_val + adjustment))
+        profiles.append((player_type, tuple(ranges)))
+    return tuple(profiles)
+
+
+# Every exact bucket up front, the large-sample ones as they are first needed
+PROFILE_TABLE = {total_hands: adjusted_profiles(total_hands) for total_hands in range(EXACT_HANDS + 1)}
+
+
+def profiles_for(total_hands):
+    bucket = sample_bucket(total_hands)
+    profiles = PROFILE_TABLE.get(bucket)
+    if profiles is None:
+        profiles = PROFILE_TABLE[bucket] = adjusted_profiles(bucket)
+    return profiles
+
+
+def range_distance(value, range_tuple):
+    min_val, max_val = range_tuple
+    if value < min_val:
+        return min_val - value
+    elif value > max_val:
+        return value - max_val
+    return 0  # value is within range
+
+
+def classify(stats):
+    """Type of one player from a stats mapping (counters keyed by STAT_FIELDS names)."""
+    total_hands = stats['total_hands']
+    if total_hands < MIN_HANDS:
+        return PlayerType.UNKNOWN
+    if total_hands < INITIAL_HANDS:
+        return PlayerType.INITIAL
+
+    values = (
+        (stats['vpip_hands'] / total_hands) * 100,
+        (stats['pfr_hands'] / total_hands) * 100,
+        (stats['bets'] + stats['raises']) / max(1, (stats['calls'] + stats['checks'])),
+        (stats['threebets'] / max(1, stats['threebet_opportunities'])) * 100
+    )
+    weights = tuple(STAT_WEIGHTS[stat] for stat in PROFILE_STATS)
+
+    # Closest profile, the first one wins a tie
+    best_type, best_distance = None, None
+    for player_type, ranges in profiles_for(total_hands):
+        distance = 0
+        for value, range_tuple, weight in zip(values, ranges, weights):
+            distance += range_distance(value, range_tuple) * weight
+        if best_distance is None or distance < best_distance:
+            best_type, best_distance = player_type, distance
+
+    # If the distance is too large, return UNKNOWN
+    if best_distance > MAX_DISTANCE:
+        if total_hands < UNSURE_HANDS:
+            return PlayerType.INITIAL
+        return PlayerType.UNKNOWN
+    return best_type
+
+
+def classify_many(counts):
+    """Types for many players at once.
+
+    counts maps the counter names classify() reads to equal-length
+    sequences, one entry per player. Returns a list of types in that order.
+    """
+    # Only bulk reclassification needs NumPy, the parser and import workers never load it
+    import numpy as np
+
+    def column(name):
+        return np.asarray(counts[name], dtype=np.float64)
+
+    total_hands = column('total_hands')
+    if not len(total_hands):
+        return []
+    hands = np.maximum(total_hands, 1)
+    values = np.stack([
+        column('vpip_hands') / hands * 100,
+        column('pfr_hands') / hands * 100,
+        (column('bets') + column('raises')) / np.maximum(1, column('calls') + column('checks')),
+        column('threebets') / np.maximum(1, column('threebet_opportunities')) * 100
+    ], axis=1)  # players x stats
+
+    # Profile ranges through the same buckets as classify(), looked up once per distinct hand count
+    unique_hands, player_rows = np.unique(total_hands.astype(np.int64), return_inverse=True)
+    table = np.array([[ranges for _, ranges in profiles_for(int(n))] for n in unique_hands])
+    ranges = table[player_rows]  # players x types x stats x (min, max)
+    lows = ranges[..., 0]
+    highs = ranges[..., 1]
+    values = values[:, np.newaxis, :]
+    distance_per_stat = np.maximum(lows - values, 0) + np.maximum(values - highs, 0)
+    weights = np.array([STAT_WEIGHTS[stat] for stat in PROFILE_STATS])
+    distances = (distance_per_stat * weights).sum(axis=2)  # players x types
+
+    best = distances.argmin(axis=1)
+    best_distance = distances[np.arange(len(best)), best]
+    types = np.array(PROFILE_TYPES, dtype=object)[best]
+    types = np.where(best_distance > MAX_DISTANCE,
+                     np.where(total_hands < UNSURE_HANDS, PlayerType.INITIAL, PlayerType.UNKNOWN), types)
+    types = np.where(total_hands < INITIAL_HANDS, PlayerType.INITIAL, types)
+    types = np.where(total_hands < MIN_HANDS, PlayerType.UNKNOWN, types)
+    return types.tolist()
+
+
+def reclassify_database(db):
+    """Retypes every player in player_stats in one pass, returns how many changed."""
+    rows = db.read('SELECT player_name, {}, player_type FROM player_stats'.format(', '.join(CLASSIFY_FIELDS)))
+    counts = {field: [row[i + 1] or 0 for row in rows] for i, field in enumerate(CLASSIFY_FIELDS)}
+    updates = [
+        (player_type, row[0])
+        for row, player_type in zip(rows, classify_many(counts))
+        if player_type != row[-1]
+    ]
+    with db.transaction() as cursor:
+        cursor.executemany('UPDATE player_stats SET player_type = ? WHERE player_name = ?', updates)
+    return len(updates)
+
+
+def main():
+    from stats_db import StatsDatabase
+
+    parser = argparse.ArgumentParser(description="Reclassify every stored player against the current profiles")
+    parser.add_argument('--db', default=str(Path.home() / "poker_stats.db"))
+    args = parser.parse_args()
+
+    db = StatsDatabase(args.db)
+    try:
+        print(f"Reclassified {reclassify_database(db)} players")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
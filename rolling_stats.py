@@ -0,0 +1,124 @@
+"""Recent-form views of a player: the last N hands and exponentially decayed stats.
+
+Each hand a player sits in is packed into one integer (stat flags plus
+capped action counts). A fixed-size ring buffer of those integers keeps
+running totals for the window, and a second set of totals decays by a
+constant factor per hand. Both cost O(1) per hand and never scan history.
+"""
+from array import array
+
+WINDOW_HANDS = 100    # Hands in the rolling window
+HALF_LIFE_HANDS = 50  # Hands after which a hand counts half in the decayed view
+DECAY = 0.5 ** (1 / HALF_LIFE_HANDS)
+
+# One bit per stat a hand can add at most once to
+FLAG_FIELDS = (
+    'vpip_hands', 'pfr_hands', 'threebets', 'threebet_opportunities',
+    'faced_3bet', 'folded_to_3bet', 'cbets', 'cbet_opportunities'
+)
+AGGRESSION_SHIFT = 8  # bets + raises this hand, capped at 255
+CALLS_SHIFT = 16      # calls this hand, capped at 255
+
+# Totals kept for both views, in this order
+VIEW_FIELDS = FLAG_FIELDS + ('aggressive', 'calls')
+
+
+def encode_hand(deltas):
+    """Packs one hand's counter changes (a stats-like mapping) into an int."""
+    code = 0
+    for bit, field in enumerate(FLAG_FIELDS):
+        if deltas[field]:
+            code |= 1 << bit
+    code |= min(255, deltas['bets'] + deltas['raises']) << AGGRESSION_SHIFT
+    code |= min(255, deltas['calls']) << CALLS_SHIFT
+    return code
+
+
+def decode_hand(code):
+    values = [(code >> bit) & 1 for bit in range(len(FLAG_FIELDS))]
+    values.append((code >> AGGRESSION_SHIFT) & 0xFF)
+    values.append((code >> CALLS_SHIFT) & 0xFF)
+    return values
+
+
+def view_stats(hands, totals):
+    # Same keys the HUD reads from all-time stats, aggression goes in as bets
+    stats = dict(zip(FLAG_FIELDS, totals))
+    stats.update({
+        'total_hands': hands,
+        'bets': totals[-2],
+        'raises': 0,
+        'calls': totals[-1]
+    })
+    return stats
+
+
+class RecentStats:
+    __slots__ = ('window', 'start', 'count', 'window_totals', 'decayed', 'decayed_hands')
+
+    def __init__(self):
+        self.window = array('I', [0]) * WINDOW_HANDS
+        self.start = 0  # Oldest hand in the buffer
+        self.count = 0
+        self.window_totals = [0] * len(VIEW_FIELDS)
+        self.decayed = [0.0] * len(VIEW_FIELDS)
+        self.decayed_hands = 0.0
+
+    def add_hand(self, code):
+        values = self.push_window(code)
+        for i, value in enumerate(values):
+            self.decayed[i] = self.decayed[i] * DECAY + value
+        self.decayed_hands = self.decayed_hands * DECAY + 1
+
+    def push_window(self, code):
+        values = decode_hand(code)
+        totals = self.window_totals
+        if self.count == WINDOW_HANDS:
+            # The oldest hand drops out as the new one takes its slot
+            for i, value in enumerate(decode_hand(self.window[self.start])):
+                totals[i] -= value
+            self.window[self.start] = code
+            self.start = (self.start + 1) % WINDOW_HANDS
+        else:
+            self.window[(self.start + self.count) % WINDOW_HANDS] = code
+            self.count += 1
+        for i, value in enumerate(values):
+            totals[i] += value
+        return values
+
+    def extend(self, later, hands):
+        """Appends the views of `later`, built over the next `hands` hands, in O(window) time."""
+        for i in range(later.count):
+            self.push_window(later.window[(later.start + i) % WINDOW_HANDS])
+        scale = DECAY ** hands
+        for i, value in enumerate(later.decayed):
+            self.decayed[i] = self.decayed[i] * scale + value
+        self.decayed_hands = self.decayed_hands * scale + later.decayed_hands
+
+    def window_view(self):
+        return view_stats(self.count, self.window_totals)
+
+    def decayed_view(self):
+        return view_stats(self.decayed_hands, self.decayed)
+
+    def to_row(self, player_name):
+        decayed = array('d', self.decayed)
+        decayed.append(self.decayed_hands)
+        return (player_name, self.window.tobytes(), self.start, self.count, decayed.tobytes())
+
+    @classmethod
+    def from_row(cls, row):
+        recent = cls()
+        _, window, recent.start, recent.count, decayed = row
+        recent.window = array('I')
+        recent.window.frombytes(window)
+        if len(recent.window) != WINDOW_HANDS:
+            return cls()  # Stored with another window size, start over
+        for i in range(recent.count):
+            for j, value in enumerate(decode_hand(recent.window[(recent.start + i) % WINDOW_HANDS])):
+                recent.window_totals[j] += value
+        values = array('d')
+        values.frombytes(decayed)
+        recent.decayed = list(values[:-1])
+        recent.decayed_hands = values[-1]
+        return recent
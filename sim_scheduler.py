@@ -0,0 +1,299 @@
+import atexit
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+
+from simulation import simulate_batch
+from sim_worker import BACKENDS, create_pool, default_backend
+
+FOCUS_WEIGHT = 3  # Batches the focused window may dispatch per round-robin turn
+# A pool never reports a batch whose worker died, so batches out this long are
+# failed and their pool replaced
+BATCH_TIMEOUT = 60.0
+STALL_CHECK_INTERVAL = 1.0  # Seconds between checks while batches are out
+
+
+class SimulationJob:
+    def __init__(self, client_id, num_batches):
+        self.client_id = client_id
+        self.remaining = num_batches
+        self.counts = {"win": 0, "tie": 0, "lose": 0}
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"Simulation did not finish within {timeout} s")
+        if self.cancelled:
+            raise RuntimeError("Simulation was cancelled")
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        return dict(self.counts)
+
+
+class SimulationScheduler:
+    """Process-wide scheduler shared by every calculator window.
+
+    All windows draw from one fixed worker budget. Queued batches are handed
+    out round-robin between windows, with extra turns for the focused one.
+    """
+
+    def __init__(self, workers=None, backend=None):
+        self.workers = workers or cpu_count()
+        self.backend = self._check_backend(backend)
+        # Only the dispatcher thread creates and replaces executors
+        self.executor = None
+        self.executor_backend = None
+        self.retired_executors = []  # Finishing their last batches after a backend change
+        self.batches = {}  # batch id -> (job, executor, dispatch time)
+        self.batch_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.work_changed = threading.Condition(self.lock)
+        self.queues = OrderedDict()  # client id -> deque of (job, batch args)
+        self.client_names = {}
+        self.focused_client = None
+        self.focus_credit = FOCUS_WEIGHT
+        self.in_flight = 0
+        self.running = True
+        self.client_ids = itertools.count(1)
+        self.metrics = {
+            'jobs_submitted': 0,
+            'jobs_started': 0,
+            'jobs_completed': 0,
+            'batches_dispatched': 0,
+            'stalled_pools': 0,
+            'total_queue_wait': 0.0,
+            'max_queue_wait': 0.0,
+            'total_job_time': 0.0
+        }
+        self.dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.dispatcher.start()
+
+    def _check_backend(self, backend):
+        backend = backend or default_backend()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown simulation backend: {backend}")
+        return backend
+
+    def set_backend(self, backend):
+        # Batches already out finish where they are, the next one starts the new backend
+        backend = self._check_backend(backend)
+        with self.lock:
+            self.backend = backend
+
+    def register_client(self, name=None):
+        with self.lock:
+            client_id = next(self.client_ids)
+            self.queues[client_id] = deque()
+            self.client_names[client_id] = name or f"Table {client_id}"
+            return client_id
+
+    def unregister_client(self, client_id):
+        with self.lock:
+            # Its queued batches are dropped, batches already out finish unseen
+            jobs = {job for job, _ in self.queues.pop(client_id, ())}
+            jobs.update(job for job, _, _ in self.batches.values() if job.client_id == client_id)
+            for job in jobs:
+                if not job.done.is_set():
+                    job.cancelled = True
+                    job.done.set()
+            self.client_names.pop(client_id, None)
+            if self.focused_client == client_id:
+                self.focused_client = None
+
+    def set_focus(self, client_id):
+        with self.lock:
+            if self.focused_client != client_id:
+                self.focused_client = client_id
+                self.focus_credit = FOCUS_WEIGHT
+                self.work_changed.notify()
+
+    def submit(self, client_id, batch_args):
+        job = SimulationJob(client_id, len(batch_args))
+        with self.lock:
+            self.metrics['jobs_submitted'] += 1
+            if not batch_args:
+                job.done.set()
+                return job
+            queue = self.queues.get(client_id)
+            if queue is None:
+                # The window closed while the job was being set up
+                job.cancelled = True
+                job.done.set()
+                return job
+            queue.extend((job, args) for args in batch_args)
+            self.work_changed.notify()
+        return job
+
+    def get_metrics(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['avg_queue_wait_ms'] = metrics.pop('total_queue_wait') / max(1, metrics['jobs_started']) * 1000
+            metrics['max_queue_wait_ms'] = metrics.pop('max_queue_wait') * 1000
+            metrics['avg_job_ms'] = metrics.pop('total_job_time') / max(1, metrics['jobs_completed']) * 1000
+            metrics['workers'] = self.workers
+            metrics['backend'] = self.backend
+            metrics['in_flight'] = self.in_flight
+            metrics['queued_batches'] = {self.client_names.get(c, c): len(q) for c, q in self.queues.items()}
+            metrics['focused'] = self.client_names.get(self.focused_client)
+            return metrics
+
+    def shutdown(self):
+        with self.lock:
+            self.running = False
+            self.work_changed.notify_all()
+        self.dispatcher.join()
+        for executor in self.retired_executors + [self.executor]:
+            if executor is not None:
+                self._close_executor(executor, terminate=True)
+
+    def _close_executor(self, executor, terminate=False):
+        if isinstance(executor, ThreadPoolExecutor):
+            executor.shutdown(wait=False)
+        elif terminate:
+            executor.terminate()
+        else:
+            executor.close()  # Lets the batches it holds finish
+
+    def _next_task(self):
+        # Called with the lock held
+        ready = [c for c, q in self.queues.items() if q]
+        if not ready:
+            return None
+        focused = self.focused_client
+        if focused in ready and (self.focus_credit > 0 or len(ready) == 1):
+            self.focus_credit -= 1
+            client_id = focused
+        else:
+            self.focus_credit = FOCUS_WEIGHT
+            client_id = next((c for c in ready if c != focused), ready[0])
+            # Rotate so the next turn starts with a different window
+            self.queues.move_to_end(client_id)
+        return self.queues[client_id].popleft()
+
+    def _dispatch_loop(self):
+        while True:
+            task = None
+            with self.lock:
+                if self.running and (self.in_flight >= self.workers or not any(self.queues.values())):
+                    # Wake up now and then while batches are out, in case one was lost
+                    self.work_changed.wait(STALL_CHECK_INTERVAL if self.in_flight else None)
+                if not self.running:
+                    return
+                broken = self._expire_stalled(time.perf_counter())
+                if self.in_flight < self.workers and any(self.queues.values()):
+                    job, args = self._next_task()
+                    if job.started_at is None:
+                        job.started_at = time.perf_counter()
+                        self.metrics['jobs_started'] += 1
+                        wait = job.started_at - job.submitted_at
+                        self.metrics['total_queue_wait'] += wait
+                        self.metrics['max_queue_wait'] = max(self.metrics['max_queue_wait'], wait)
+                    self.in_flight += 1
+                    self.metrics['batches_dispatched'] += 1
+                    task = (job, args, next(self.batch_ids), self.backend)
+
+            if broken is not None:
+                if broken is self.executor:
+                    self.executor = None
+                self._close_executor(broken, terminate=True)
+            if task is not None:
+                self._start_batch(*task)
+
+    def _expire_stalled(self, now):
+        # Called with the lock held, fails every batch on an executor that lost one
+        broken = next((executor for _, executor, dispatched in self.batches.values()
+                       if now - dispatched > BATCH_TIMEOUT), None)
+        if broken is None:
+            return None
+        self.metrics['stalled_pools'] += 1
+        for batch_id, (_, executor, _) in list(self.batches.items()):
+            if executor is broken:
+                self._complete_batch(batch_id, None, "Simulation worker stopped responding")
+        return broken
+
+    def _start_batch(self, job, args, batch_id, backend):
+        if self.executor is not None and self.executor_backend != backend:
+            # Backend changed, the old executor finishes what it has and is closed
+            self._close_executor(self.executor)
+            self.retired_executors.append(self.executor)
+            self.executor = None
+        if self.executor is None:
+            if backend == 'process':
+                self.executor = create_pool(self.workers)
+            else:
+                # The inline backend still needs a thread so the dispatcher never blocks
+                self.executor = ThreadPoolExecutor(max_workers=self.workers if backend == 'thread' else 1)
+            self.executor_backend = backend
+
+        executor = self.executor
+        with self.lock:
+            self.batches[batch_id] = (job, executor, time.perf_counter())
+        try:
+            if backend == 'process':
+                executor.apply_async(simulate_batch, (args,),
+                                     callback=lambda counts: self._finish_batch(batch_id, counts),
+                                     error_callback=lambda e: self._finish_batch(batch_id, None, e))
+            else:
+                future = executor.submit(simulate_batch, args)
+                future.add_done_callback(lambda f: self._finish_future(batch_id, f))
+        except Exception as e:
+            self._finish_batch(batch_id, None, e)
+
+    def _finish_future(self, batch_id, future):
+        error = future.exception()
+        self._finish_batch(batch_id, None if error else future.result(), error)
+
+    def _finish_batch(self, batch_id, counts, error=None):
+        with self.lock:
+            self._complete_batch(batch_id, counts, error)
+
+    def _complete_batch(self, batch_id, counts, error=None):
+        # Called with the lock held. A batch already failed as stalled is ignored if it turns up late
+        entry = self.batches.pop(batch_id, None)
+        if entry is None:
+            return
+        job = entry[0]
+        self.in_flight -= 1
+        if error is not None:
+            job.error = str(error)
+            self._drop_queued(job)
+        elif counts is not None:
+            for outcome, count in counts.items():
+                job.counts[outcome] += count
+        job.remaining -= 1
+        if job.remaining == 0 or job.error is not None:
+            if not job.done.is_set():
+                job.finished_at = time.perf_counter()
+                self.metrics['jobs_completed'] += 1
+                self.metrics['total_job_time'] += job.finished_at - job.submitted_at
+                job.done.set()
+        self.work_changed.notify()
+
+    def _drop_queued(self, job):
+        # Called with the lock held, the rest of a failed job is never dispatched
+        queue = self.queues.get(job.client_id)
+        if queue:
+            self.queues[job.client_id] = deque(entry for entry in queue if entry[0] is not job)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(backend=None):
+    """The process-wide scheduler; a backend given here replaces the current one."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SimulationScheduler(backend=backend)
+            atexit.register(_scheduler.shutdown)
+        elif backend is not None:
+            _scheduler.set_backend(backend)
+        return _scheduler
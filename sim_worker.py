@@ -0,0 +1,89 @@
+"""Lightweight entry module for simulation worker processes.
+
+With the 'spawn' start method every child re-imports the parent's
+__main__ module, which for monsterhand.py means PyQt6, tkinter, analyser.py
+and watchdog. Pools created here present this module as __main__ while the
+workers start, so children only import the evaluation core.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Imported up front so a worker is ready to evaluate as soon as it starts
+from simulation import simulate_batch
+
+BACKENDS = ('process', 'thread', 'inline')
+
+_startup = {}
+
+# sys.modules['__main__'] is process-wide, pools started from different threads
+# (the simulation scheduler, bulk imports) take turns swapping it
+_main_lock = threading.RLock()
+
+
+def _init_worker(spawn_time):
+    # Wall clock time from the parent asking for the pool until this worker is ready
+    _startup['seconds'] = time.time() - spawn_time
+
+
+def worker_startup_time(delay=0.0):
+    # The delay keeps one worker from taking every task while measuring
+    time.sleep(delay)
+    return os.getpid(), _startup.get('seconds')
+
+
+@contextmanager
+def lightweight_main(module_name=__name__):
+    # Held until the pool has started its workers, they read __main__ as they spawn
+    with _main_lock:
+        main_module = sys.modules['__main__']
+        sys.modules['__main__'] = sys.modules[module_name]
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = main_module
+
+
+def create_pool(processes=None, lightweight=True):
+    # Spawn everywhere, Linux builds included, so every platform behaves the same
+    context = multiprocessing.get_context('spawn')
+    processes = processes or multiprocessing.cpu_count()
+    if not lightweight:
+        return context.Pool(processes=processes, initializer=_init_worker, initargs=(time.time(),))
+    with lightweight_main():
+        return context.Pool(processes=processes, initializer=_init_worker, initargs=(time.time(),))
+
+
+def default_backend():
+    # Free-threaded CPython runs evaluation threads in parallel, so skip spawning
+    if hasattr(sys, '_is_gil_enabled') and not sys._is_gil_enabled():
+        return 'thread'
+    return 'process'
+
+
+def run_batches(args, backend=None, workers=None):
+    """Runs simulate_batch over args on the chosen backend and returns the counts."""
+    backend = backend or default_backend()
+    if backend == 'inline':
+        return [simulate_batch(batch_args) for batch_args in args]
+    workers = workers or multiprocessing.cpu_count()
+    if backend == 'thread':
+        # No spawn and no pickling, worthwhile when evaluation releases the GIL
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(simulate_batch, args))
+    if backend == 'process':
+        with create_pool(workers) as pool:
+            return pool.map(simulate_batch, args)
+    raise ValueError(f"Unknown simulation backend: {backend}")
+
+
+def measure_worker_startup(processes=None, lightweight=True):
+    processes = processes or multiprocessing.cpu_count()
+    with create_pool(processes, lightweight) as pool:
+        samples = pool.map(worker_startup_time, [0.2] * (processes * 2), chunksize=1)
+    return sorted(dict(samples).values())
+
@@ -808,52 +808,24 @@ class HandEvaluator:
 
 
 
-def simulate_single_round(args):
-    hole_cards, community_cards, available_cards, num_players, unknown_cards = args
-
-    if not community_cards:
-        hero_hand = sorted(hole_cards, key=lambda x: x.get_value(), reverse=True)
-        hero_suited = hero_hand[0].suit == hero_hand[1].suit
-        hero_paired = hero_hand[0].rank == hero_hand[1].rank
-        hero_values = [c.get_value() for c in hero_hand]
-
-        simulation_deck = list(available_cards)  # Create a new list instead of using .copy()
-        random.shuffle(simulation_deck)
-        community = []
-        for _ in range(5):
-            if simulation_deck:
-                community.append(simulation_deck.pop())
-        hero_best = HandEvaluator.evaluate_hand(hole_cards + community)
-        for _ in range(num_players - 1):
-            if len(simulation_deck) < 2:
-                break
-            villain_hole = [simulation_deck.pop(), simulation_deck.pop()]
-            villain_best = HandEvaluator.evaluate_hand(villain_hole + community)
-            if villain_best.rank.value > hero_best.rank.value:
-                return "lose"
-            elif villain_best.rank.value == hero_best.rank.value:
-                if hero_best.rank == HandRank.STRAIGHT:
-                    hero_high = max(hero_best.values)
-                    villain_high = max(villain_best.values)
-                    if villain_high > hero_high:
-                        return "lose"
-                    elif villain_high == hero_high:
-                        return "tie"
-                else:
-                    for hero_val, villain_val in zip(hero_best.values, villain_best.values):
-                        if villain_val > hero_val:
-                            return "lose"
-                        elif villain_val < hero_val:
-                            break
-                    else:
-                        return "tie"
-        return "win"
-    simulation_deck = list(available_cards)
-    random.shuffle(simulation_deck)
-    board = list(community_cards)
-    if unknown_cards > 0:
-        board.extend(simulation_deck[:unknown_cards])
-        simulation_deck = simulation_deck[unknown_cards:]
+SAMPLING_STRATEGIES = ('plain', 'stratified', 'antithetic')
+
+# Share of the plain sampler's sample count each strategy needs for the same
+# standard error, keyed by number of community cards. Measured over four spots
+# per street with `python benchmarks.py variance --samples 300 --replicates 600
+# --strategies stratified`. Stratified variance ratios were 0.96 +/- 0.04
+# preflop, 0.93 +/- 0.04 flop, 0.63 +/- 0.03 turn and 0.90 +/- 0.04 river.
+# Only the turn saving is clear of the noise. Single turn spots ranged from
+# 0.27 to 1.0, so its discount stays well short of the mean. Antithetic decks
+# did not reduce variance reliably either, so they get no discount.
+STRATEGY_SAMPLE_FACTORS = {
+    'plain': {0: 1.0, 3: 1.0, 4: 1.0, 5: 1.0},
+    'stratified': {0: 1.0, 3: 1.0, 4: 0.85, 5: 1.0},
+    'antithetic': {0: 1.0, 3: 1.0, 4: 1.0, 5: 1.0}
+}
+
+
+def _showdown(hole_cards, board, simulation_deck, num_players):
     hero_best = HandEvaluator.evaluate_hand(hole_cards + board)
     for _ in range(num_players - 1):
         if len(simulation_deck) < 2:
@@ -878,4 +850,82 @@ def simulate_single_round(args):
                         break
                 else:  # All values equal
                     return "tie"
-    return "win"
\ No newline at end of file
+    return "win"
+
+
+def _play_deck(hole_cards, community_cards, simulation_deck, num_players, unknown_cards):
+    board = list(community_cards)
+    if unknown_cards > 0:
+        board.extend(simulation_deck[:unknown_cards])
+        simulation_deck = simulation_deck[unknown_cards:]
+    return _showdown(hole_cards, board, simulation_deck, num_players)
+
+
+def simulate_single_round(args):
+    hole_cards, community_cards, available_cards, num_players, unknown_cards = args
+
+    simulation_deck = list(available_cards)  # Create a new list instead of using .copy()
+    random.shuffle(simulation_deck)
+    return _play_deck(hole_cards, community_cards, simulation_deck, num_players, unknown_cards)
+
+
+def simulate_batch(args):
+    """Runs num_rounds rounds of one spot and returns win/tie/lose counts.
+
+    'stratified' deals every available card as the next card equally often
+    (next community card, or the first villain card on the river) and
+    'antithetic' pairs each shuffled deck with its rank-mirrored deck.
+    """
+    hole_cards, community_cards, available_cards, num_players, unknown_cards, num_rounds, strategy = args
+    counts = {"win": 0, "tie": 0, "lose": 0}
+
+    if strategy == 'stratified' and available_cards:
+        # Random stratum order keeps a partial last cycle unbiased
+        strata = list(range(len(available_cards)))
+        random.shuffle(strata)
+        for i in range(num_rounds):
+            idx = strata[i % len(strata)]
+            rest = available_cards[:idx] + available_cards[idx + 1:]
+            random.shuffle(rest)
+            if unknown_cards > 0:
+                simulation_deck = [available_cards[idx]] + rest
+            else:
+                simulation_deck = rest + [available_cards[idx]]  # Villains are dealt from the end
+            counts[_play_deck(hole_cards, community_cards, simulation_deck, num_players, unknown_cards)] += 1
+
+    elif strategy == 'antithetic':
+        # Bijection pairing the lowest available card with the highest and so on,
+        # so the mirrored deck is still a uniformly random deck
+        ordered = sorted(available_cards, key=lambda c: (c.get_value(), c.suit))
+        mirror = dict(zip(ordered, reversed(ordered)))
+        for i in range(num_rounds):
+            if i % 2 == 0:
+                simulation_deck = list(available_cards)
+                random.shuffle(simulation_deck)
+                mirrored_deck = [mirror[c] for c in simulation_deck]
+            else:
+                simulation_deck = mirrored_deck
+            counts[_play_deck(hole_cards, community_cards, simulation_deck, num_players, unknown_cards)] += 1
+
+    else:
+        for _ in range(num_rounds):
+            counts[simulate_single_round((hole_cards, community_cards, available_cards,
+                                          num_players, unknown_cards))] += 1
+
+    return counts
+
+
+def split_batches(num_samples, num_batches):
+    size, remainder = divmod(num_samples, num_batches)
+    return [size + (1 if i < remainder else 0) for i in range(num_batches) if size or i < remainder]
+
+
+def summarize_counts(result_counts):
+    total = sum(result_counts.values())
+    if total == 0:
+        return {"win": 0, "tie": 0, "lose": 0}
+    return {
+        "win": round((result_counts["win"] / total) * 100, 2),
+        "tie": round((result_counts["tie"] / total) * 100, 2),
+        "lose": round((result_counts["lose"] / total) * 100, 2)
+    }
@@ -0,0 +1,74 @@
+"""Shared SQLite access for the stats database.
+
+One long-lived writer connection in WAL mode takes every write, a batch
+of hands at a time. Each thread that only reads (the HUD, the watcher)
+gets its own read connection, so refreshing the table never waits on the
+writer or opens a connection per query.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Applied to every connection. WAL lets readers run while a batch is written;
+# with WAL, synchronous=NORMAL only syncs at checkpoints and a crash can lose
+# at most the last commits, never corrupt the file.
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',  # 16 MB page cache
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA foreign_keys = ON'
+)
+BUSY_TIMEOUT = 5.0  # Seconds a connection waits on a lock before failing
+
+
+class StatsDatabase:
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.lock = threading.RLock()
+        self.local = threading.local()
+        self.readers = []
+        # Created here but used from the ingestion thread, the lock serialises access
+        self.writer = self.connect(check_same_thread=False)
+        self.writer.execute('PRAGMA journal_mode = WAL')
+
+    def connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        # Commits on success and rolls back on error, one fsync per batch at most
+        with self.lock:
+            with self.writer:
+                if not self.writer.in_transaction:
+                    # Take the write lock up front, so what the batch reads stays current
+                    # until it commits even with other processes writing
+                    self.writer.execute('BEGIN IMMEDIATE')
+                yield self.writer.cursor()
+
+    def reader(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+            conn.execute('PRAGMA query_only = ON')
+            with self.lock:
+                self.readers.append(conn)
+        return conn
+
+    def read(self, query, params=()):
+        return self.reader().execute(query, params).fetchall()
+
+    def read_one(self, query, params=()):
+        return self.reader().execute(query, params).fetchone()
+
+    def close(self):
+        with self.lock:
+            for conn in self.readers:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass  # Closed from a thread that did not open it, it goes with that thread
+            self.readers = []
+            self.writer.close()
@@ -0,0 +1,124 @@
+"""Model and delegate behind the HUD stats table.
+
+Each cell holds an all-time and a session value. The model keeps them as
+plain strings and the delegate paints both, so a refresh only swaps data
+and repaints the rows that changed instead of building widgets per cell.
+The stored text is always the full form, the delegate shortens it for
+the current scale as it paints.
+"""
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, QRect, Qt
+from PyQt6.QtGui import QColor, QFont
+from PyQt6.QtWidgets import QStyledItemDelegate
+
+from scaling_utils import scale_text
+
+HEADERS = ["Player", "Type", "Hands", "VPIP%", "PFR%", "AF", "3Bet%", "F3B%", "CBet%"]
+TYPE_COLUMN = 1
+
+HIST_ROLE = Qt.ItemDataRole.UserRole
+SESSION_ROLE = Qt.ItemDataRole.UserRole + 1
+
+CELL_COLOR = QColor(200, 200, 200)
+TEXT_COLOR = QColor(51, 51, 51)
+
+
+class StatsTableModel(QAbstractTableModel):
+    """Rows are (player, type color, tooltip, ((hist, session) per column))."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        _, row_color, tooltip, columns = self.rows[index.row()]
+        hist_value, session_value = columns[index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return hist_value or session_value
+        if role == HIST_ROLE:
+            return hist_value
+        if role == SESSION_ROLE:
+            return session_value
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return row_color if index.column() == TYPE_COLUMN else CELL_COLOR
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.ToolTipRole and index.column() == 0:
+            return tooltip
+        return None
+
+    def set_rows(self, rows):
+        """Replaces the table contents, returns how many rows were repainted."""
+        rows = list(rows)
+        if [row[0] for row in rows] != [row[0] for row in self.rows]:
+            # Players joined, left or moved, everything is laid out again
+            self.beginResetModel()
+            self.rows = rows
+            self.endResetModel()
+            return len(rows)
+
+        changed = 0
+        for number, row in enumerate(rows):
+            if row != self.rows[number]:
+                self.rows[number] = row
+                self.dataChanged.emit(self.index(number, 0), self.index(number, len(HEADERS) - 1))
+                changed += 1
+        return changed
+
+    def clear(self):
+        self.set_rows([])
+
+    def players(self):
+        return [row[0] for row in self.rows]
+
+
+class StatsDelegate(QStyledItemDelegate):
+    """Paints the all-time value top right and the session value below it."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.hist_font = QFont()
+        self.session_font = QFont()
+        self.scale = None
+
+    def set_scale(self, scale):
+        self.scale = scale
+        self.hist_font.setPointSize(scale['hist_font'])
+        self.session_font.setPointSize(scale['main_font'])
+
+    def paint(self, painter, option, index):
+        hist_value = index.data(HIST_ROLE)
+        session_value = index.data(SESSION_ROLE)
+        if not (hist_value and session_value):
+            # Single values (the player name) are drawn as plain items
+            super().paint(painter, option, index)
+            return
+        if self.scale:
+            hist_value = scale_text(hist_value, self.scale)
+            session_value = scale_text(session_value, self.scale)
+
+        rect = option.rect
+        half_width = rect.width() // 2
+        half_height = rect.height() // 2
+        painter.save()
+        painter.fillRect(rect, index.data(Qt.ItemDataRole.BackgroundRole))
+        painter.setPen(TEXT_COLOR)
+        painter.setFont(self.hist_font)
+        painter.drawText(QRect(rect.left() + half_width, rect.top(), rect.width() - half_width, half_height),
+                         Qt.AlignmentFlag.AlignRight, hist_value)
+        painter.setFont(self.session_font)
+        painter.drawText(QRect(rect.left(), rect.top() + half_height, half_width, rect.height() - half_height),
+                         Qt.AlignmentFlag.AlignCenter, session_value)
+        painter.restore()
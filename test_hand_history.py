@@ -0,0 +1,92 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from hand_history import HandHistoryProcessor
+
+
+def make_hand(number):
+    return "\n".join([
+        f"PokerStars Hand #{240000000000 + number}:  Hold'em No Limit ($0.01/$0.02 USD) - 2024/01/01 12:00:00 ET",
+        "Table 'Ariel III' 6-max Seat #1 is the button",
+        "Seat 1: Alice ($2.00 in chips)",
+        "Seat 2: Bob ($2.00 in chips)",
+        "Seat 3: Carl ($2.00 in chips)",
+        "Bob: posts small blind $0.01",
+        "Carl: posts big blind $0.02",
+        "*** HOLE CARDS ***",
+        "Alice: raises $0.04 to $0.06",
+        "Bob: folds",
+        "Carl: calls $0.04",
+        "*** FLOP *** [2c 7d Ts]",
+        "Carl: checks",
+        "Alice: bets $0.10",
+        "Carl: folds",
+        "*** SUMMARY ***",
+        "Total pot $0.14 | Rake $0",
+    ]) + "\n\n\n"
+
+
+def make_hands(first, count):
+    return "".join(make_hand(number) for number in range(first, first + count))
+
+
+def fail_next_commit(processor):
+    # The batch's statements run, then the commit fails as if another process held the lock
+    transaction = processor.db.transaction
+
+    @contextmanager
+    def failing_transaction():
+        processor.db.transaction = transaction
+        with transaction() as cursor:
+            yield cursor
+            raise sqlite3.OperationalError("database is locked")
+
+    processor.db.transaction = failing_transaction
+
+
+def stored_hands(db_path, player):
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return (conn.execute('SELECT total_hands FROM player_stats WHERE player_name = ?', (player,)).fetchone()[0],
+                conn.execute('SELECT COUNT(*) FROM ingested_hands').fetchone()[0],
+                conn.execute('SELECT COUNT(*) FROM hands').fetchone()[0])
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('failing', ['journal_batch', 'flush'])
+def test_failed_commit_keeps_batch_pending(tmp_path, failing):
+    db_path = tmp_path / 'stats.db'
+    processor = HandHistoryProcessor(db_path)
+    processor.process_new_hands(make_hands(0, 7))
+    processor.journal_batch()
+
+    processor.process_new_hands(make_hands(7, 5))
+    fail_next_commit(processor)
+    with pytest.raises(sqlite3.OperationalError):
+        getattr(processor, failing)()
+
+    # The next batch writes what the failed one could not
+    processor.process_new_hands(make_hands(12, 3))
+    processor.journal_batch()
+    processor.flush()
+    assert processor.get_player_stats('Alice')['total_hands'] == 15
+    assert stored_hands(db_path, 'Alice') == (15, 15, 15)
+    processor.close()
+
+
+def test_failed_batch_survives_restart(tmp_path):
+    db_path = tmp_path / 'stats.db'
+    processor = HandHistoryProcessor(db_path)
+    processor.process_new_hands(make_hands(0, 4))
+    fail_next_commit(processor)
+    with pytest.raises(sqlite3.OperationalError):
+        processor.journal_batch()
+    processor.journal_batch()
+    processor.close()
+
+    # Only the journal holds the hands, replaying it at startup flushes them
+    HandHistoryProcessor(db_path).close()
+    assert stored_hands(db_path, 'Alice') == (4, 4, 4)
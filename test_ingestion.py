@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip('watchdog')
+pytest.importorskip('PyQt6')
+
+from ingestion import PokerHandHistoryWatcher, complete_hands_end
+from test_hand_history import make_hand
+
+
+class StubSignal:
+    def connect(self, slot):
+        pass
+
+    def disconnect(self, slot):
+        pass
+
+
+class StubWorker:
+    """Stands in for IngestionWorker and keeps the chunks the watcher queues."""
+
+    def __init__(self):
+        self.processor = self
+        self.offsets_committed = StubSignal()
+        self.batch_failed = StubSignal()
+        self.chunks = []
+
+    def load_file_offsets(self):
+        return {}
+
+    def submit_text(self, file_path, content, state):
+        self.chunks.append(content)
+
+
+@pytest.fixture
+def watcher():
+    watcher = PokerHandHistoryWatcher("PokerStars", StubWorker())
+    yield watcher
+    watcher.stop()
+
+
+def test_hand_written_in_two_parts(tmp_path, watcher):
+    path = tmp_path / 'table.txt'
+    second = make_hand(1)
+    split = second.index("*** FLOP ***")
+    chunks = watcher.ingestion_worker.chunks
+
+    # The client pauses in the middle of the second hand
+    path.write_text(make_hand(0) + second[:split], encoding='utf-8')
+    watcher.process_file(str(path))
+    assert chunks == [make_hand(0)]
+
+    # Its last line is written, but not the separator yet
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(second[split:].rstrip('\n') + '\n')
+    watcher.process_file(str(path))
+    assert chunks == [make_hand(0)]
+
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('\n\n')
+    watcher.process_file(str(path))
+    assert [chunk.rstrip('\n') for chunk in chunks] == [make_hand(0).rstrip('\n'), second.rstrip('\n')]
+
+
+def test_next_header_completes_hand():
+    first = b"PokerStars Hand #1: ...\r\nSeat 1: Alice\r\n"
+    assert complete_hands_end(first) == 0
+    assert complete_hands_end(first + b"PokerStars Hand #2: ...\r\nSeat") == len(first)
+    # 888poker's game number line belongs to the hand after it
+    game = b"#Game No : 500001\r\n***** 888poker Hand History for Game 500001 *****\r\n"
+    assert complete_hands_end(b"** Summary **\r\n" + game) == len(b"** Summary **\r\n")
+    assert complete_hands_end(b"** Summary **\r\n\r\n" + game) == len(b"** Summary **\r\n\r\n")